@@ -1,3 +1,29 @@
 # see LICENSE
 
 VERSION = (0, 5, 13)
+
+# callable receiving the structured events of the encoders and decoders,
+# see set_tracer
+tracer = None
+
+
+def set_tracer(new_tracer):
+    """
+    Sets the tracer of python-messaging, None turns tracing off
+
+    The tracer is called as ``tracer(stage, **fields)``, ``stage`` being:
+
+    * ``'sms.submit'``, once per :meth:`~messaging.sms.SmsSubmit.to_pdu`
+      call, with ``fmt``, ``dcs``, ``length`` (characters of the text),
+      ``segments`` and ``elapsed`` (seconds)
+    * ``'sms.submit.segment'``, once per segment, with ``seq``, ``cnt``
+      and ``size`` (octets of the TPDU, SMSC address excluded)
+    * ``'mms.decode.body'``, once per MMS body decoded, with ``parts``
+      and ``elapsed``
+    * ``'mms.decode.part'``, once per part, with ``index``,
+      ``content_type``, ``headers_size`` and ``size``
+
+    Nothing is formatted or measured while no tracer is set.
+    """
+    global tracer
+    tracer = new_tracer
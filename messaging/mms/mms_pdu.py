@@ -16,7 +16,9 @@ import array
 import os
 import random
 import logging
+from time import perf_counter
 
+import messaging
 from messaging.mms import message, wsp_pdu
 from messaging.mms.iterator import PreviewIterator
 
@@ -160,6 +162,10 @@ class MMSDecoder(wsp_pdu.Decoder):
                           body
         :type data_iter: iter
         """
+        tracer = messaging.tracer
+        if tracer is not None:
+            start = perf_counter()
+
         ######### MMS body: headers ###########
         # Get the number of data parts in the MMS body
         try:
@@ -167,8 +173,6 @@ class MMSDecoder(wsp_pdu.Decoder):
         except StopIteration:
             return
 
-        logging.debug('Number of data entries (parts) in MMS body: %i' % num_entries)
-
         ########## MMS body: entries ##########
         # For every data "part", we have to read the following sequence:
         # <length of content-type + other possible headers>,
@@ -176,7 +180,6 @@ class MMSDecoder(wsp_pdu.Decoder):
         # <content-type + other possible headers>,
         # <data>
         for part_num in range(num_entries):
-            logging.debug('\nPart %d:\n------' % part_num)
             headers_len = self.decode_uint_var(data_iter)
             data_len = self.decode_uint_var(data_iter)
 
@@ -209,6 +212,13 @@ class MMSDecoder(wsp_pdu.Decoder):
             part.content_type_parameters = ct_parameters
             part.headers = headers
             self._mms_message.add_data_part(part)
+            if tracer is not None:
+                tracer('mms.decode.part', index=part_num, content_type=ctype,
+                       headers_size=headers_len, size=data_len)
+
+        if tracer is not None:
+            tracer('mms.decode.body', parts=num_entries,
+                   elapsed=perf_counter() - start)
 
     @staticmethod
     def decode_header(byte_iter):
@@ -1,7 +1,11 @@
 # See LICENSE
 
-from messaging.sms.submit import SmsSubmit
+from messaging.sms.submit import SmsSubmit, SubmitProfile
 from messaging.sms.deliver import SmsDeliver
 from messaging.sms.gsm0338 import is_valid_gsm
+from messaging.sms.planner import estimate
+from messaging.sms.bulk import encode_many
+from messaging.sms.template import SmsTemplate
 
-__all__ = ["SmsSubmit", "SmsDeliver", "is_valid_gsm"]
+__all__ = ["SmsSubmit", "SubmitProfile", "SmsDeliver", "is_valid_gsm",
+           "estimate", "encode_many", "SmsTemplate"]
@@ -0,0 +1,156 @@
+# See LICENSE
+"""Streaming parser for the SMS related responses of AT modems"""
+
+from messaging.sms.deliver import SmsDeliver
+
+CMGL = b'+CMGL:'
+CMGR = b'+CMGR:'
+CMT = b'+CMT:'
+CDS = b'+CDS:'
+
+# message status in PDU mode (3GPP TS 27.005 3.1)
+REC_UNREAD = 0
+REC_READ = 1
+STO_UNSENT = 2
+STO_SENT = 3
+
+
+class ModemMessage:
+    """
+    I am a PDU read from a modem along with its storage metadata
+
+    ``kind`` is the response it came in (``'CMGL'``, ``'CMGR'``, ``'CMT'``
+    or ``'CDS'``), ``index`` and ``stat`` are only known for the listing
+    and reading commands. The PDU is only decoded when :attr:`sms` is
+    first accessed.
+    """
+    __slots__ = ('kind', 'index', 'stat', 'length', 'pdu', '_sms')
+
+    def __init__(self, kind, pdu, length, index=None, stat=None):
+        self.kind = kind
+        self.pdu = pdu
+        self.length = length
+        self.index = index
+        self.stat = stat
+        self._sms = None
+
+    def __repr__(self):
+        args = (self.kind, self.index, self.stat, self.length)
+        return "<ModemMessage %s index: %s stat: %s length: %s>" % args
+
+    @property
+    def sms(self):
+        """The :class:`~messaging.sms.SmsDeliver` for this PDU"""
+        if self._sms is None:
+            self._sms = SmsDeliver(self.pdu)
+
+        return self._sms
+
+
+def _int(field):
+    field = field.strip()
+    try:
+        return int(field)
+    except ValueError:
+        # text mode status, e.g. "REC UNREAD"
+        return field.strip(b'"').decode('ascii', 'replace')
+
+
+def _parse_header(line):
+    """Returns (kind, index, stat, length) or None for other lines"""
+    if line.startswith(CMGL):
+        fields = line[len(CMGL):].split(b',')
+        return 'CMGL', _int(fields[0]), _int(fields[1]), _int(fields[-1])
+
+    if line.startswith(CMGR):
+        fields = line[len(CMGR):].split(b',')
+        return 'CMGR', None, _int(fields[0]), _int(fields[-1])
+
+    if line.startswith(CMT):
+        fields = line[len(CMT):].split(b',')
+        return 'CMT', None, None, _int(fields[-1])
+
+    if line.startswith(CDS):
+        fields = line[len(CDS):].split(b',')
+        return 'CDS', None, None, _int(fields[-1])
+
+    return None
+
+
+class ResponseParser:
+    """
+    I parse modem output fed in arbitrary chunks
+
+    Every ``+CMGL``/``+CMGR``/``+CMT``/``+CDS`` header line and the PDU
+    line following it are turned into a :class:`ModemMessage`. Any other
+    non-empty line (``OK``, ``ERROR``, unsolicited result codes, ...) is
+    passed to :meth:`line_received`, as are PDU lines garbled by line
+    noise into non ASCII data.
+    """
+
+    def __init__(self):
+        self._buffer = b''
+        self._header = None
+
+    @property
+    def partial_line(self):
+        """The incomplete line buffered so far, e.g. a ``> `` prompt"""
+        return self._buffer
+
+    def feed(self, data):
+        """
+        Feeds ``data`` to the parser and yields the completed messages
+
+        The returned generator must be consumed for ``data`` to be parsed
+        """
+        buf = self._buffer + data
+        start = 0
+        while True:
+            end = buf.find(b'\n', start)
+            if end == -1:
+                break
+
+            line = buf[start:end].strip()
+            start = end + 1
+            if line:
+                msg = self._process_line(line)
+                if msg is not None:
+                    yield msg
+
+        self._buffer = buf[start:]
+
+    def _process_line(self, line):
+        header = self._header
+        if header is not None:
+            self._header = None
+            kind, index, stat, length = header
+            try:
+                pdu = line.decode('ascii')
+            except UnicodeDecodeError:
+                self.line_received(line)
+                return None
+
+            return ModemMessage(kind, pdu, length, index, stat)
+
+        header = _parse_header(line)
+        if header is not None:
+            self._header = header
+        else:
+            self.line_received(line)
+
+        return None
+
+    def line_received(self, line):
+        """Called for every line that is not part of a message"""
+
+
+def iter_messages(chunks):
+    """
+    Yields a :class:`ModemMessage` for every PDU found in ``chunks``
+
+    :param chunks: iterable of ``bytes`` read from the modem, split at
+                   arbitrary positions
+    """
+    parser = ResponseParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
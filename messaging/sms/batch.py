@@ -0,0 +1,182 @@
+# See LICENSE
+"""Columnar decoding of large batches of SMS-DELIVER PDUs"""
+
+from array import array
+
+from messaging.utils import (NIBBLE_SWAP, decode_scts, udh_septets,
+                             unpack_septets)
+from messaging.sms import consts
+from messaging.sms.gsm0338 import get_charset
+from messaging.sms.udh import UserDataHeader
+
+
+class DeliverBatch:
+    """
+    I am a batch of decoded SMS-DELIVER PDUs stored column by column
+
+    Numeric columns are :class:`array.array` objects, so they can be
+    handed to NumPy without copying (``numpy.frombuffer(batch.date,
+    dtype=numpy.int64)``). Senders and texts are stored in one shared
+    string buffer each, row ``i`` spanning ``offsets[i]:offsets[i + 1]``.
+
+    Rows that could not be decoded have ``fmt`` set to ``0xFF`` and their
+    index is listed in :attr:`errors`.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.dcs = array('B', bytes(size))
+        self.pid = array('B', bytes(size))
+        self.fmt = array('B', bytes(size))
+        # TP-SCTS as seconds since the epoch, UTC
+        self.date = array('q', [0]) * size
+        # concatenation info, ref is -1 for single part messages
+        self.ref = array('l', [-1]) * size
+        self.cnt = array('B', bytes(size))
+        self.seq = array('B', bytes(size))
+        self.senders = ''
+        self.sender_offsets = array('Q', [0]) * (size + 1)
+        self.texts = ''
+        self.text_offsets = array('Q', [0]) * (size + 1)
+        self.errors = []
+
+    def __len__(self):
+        return self.size
+
+    def sender(self, i):
+        return self.senders[self.sender_offsets[i]:self.sender_offsets[i + 1]]
+
+    def text(self, i):
+        return self.texts[self.text_offsets[i]:self.text_offsets[i + 1]]
+
+    def row(self, i):
+        """Returns row ``i`` as a dict, mimicking :attr:`SmsDeliver.data`"""
+        ret = {
+            'number': self.sender(i),
+            'text': self.text(i),
+            'pid': self.pid[i],
+            'dcs': self.dcs[i],
+            'fmt': self.fmt[i],
+            'date': self.date[i],
+        }
+        if self.ref[i] >= 0:
+            ret.update({
+                'ref': self.ref[i],
+                'cnt': self.cnt[i],
+                'seq': self.seq[i],
+            })
+
+        return ret
+
+
+def _decode_address(data, length, toa):
+    if (toa >> 4) & 0x07 == consts.ALPHANUMERIC:
+        return unpack_septets(data, length * 4 // 7).decode("gsm0338")
+
+    number = data.translate(NIBBLE_SWAP).hex()[:length]
+    if (toa >> 4) & 0x07 == consts.INTERNATIONAL:
+        return '+' + number
+
+    return number
+
+
+def _decode_one(batch, i, pdu):
+    if isinstance(pdu, str):
+        pdu = bytes.fromhex(pdu)
+
+    # skip the service centre address
+    pos = pdu[0] + 1
+    mtype = pdu[pos]
+    if mtype & 0x03 != 0x00:
+        raise ValueError("Not a SMS-DELIVER PDU")
+
+    sndlen = pdu[pos + 1]
+    sndtype = pdu[pos + 2]
+    pos += 3
+    end = pos + (sndlen + 1) // 2
+    sender = _decode_address(pdu[pos:end], sndlen, sndtype)
+
+    pid = pdu[end]
+    dcs = pdu[end + 1]
+    if dcs & (0x04 | 0x08) == 0:
+        fmt = 0x00
+    elif dcs & 0x04:
+        fmt = 0x04
+    else:
+        fmt = 0x08
+
+    date = int(decode_scts(pdu[end + 2:end + 9]).timestamp())
+    udl = pdu[end + 9]
+    ud = pdu[end + 10:]
+
+    udh = None
+    headlen = 0
+    if mtype & 0x40:
+        headlen = ud[0] + 1
+        udh = UserDataHeader.from_bytes(ud[1:headlen])
+
+    if fmt == 0x00:
+        skip = udh_septets(headlen)[0]
+        septets = unpack_septets(ud, udl)[skip:]
+        if udh is not None and (udh.locking_shift or udh.single_shift):
+            charset = get_charset(udh.locking_shift, udh.single_shift)
+            text = charset.decode(septets)
+        else:
+            text = septets.decode("gsm0338")
+    elif fmt == 0x04:
+        text = ud[headlen:udl].decode("latin-1")
+    else:
+        text = ud[headlen:udl].decode("utf-16-be", "replace")
+
+    batch.pid[i] = pid
+    batch.dcs[i] = dcs
+    batch.fmt[i] = fmt
+    batch.date[i] = date
+    if udh is not None and udh.concat is not None:
+        batch.ref[i] = udh.concat.ref
+        batch.cnt[i] = udh.concat.cnt
+        batch.seq[i] = udh.concat.seq
+
+    return sender, text
+
+
+def decode_batch(pdus, strict=False):
+    """
+    Decodes the SMS-DELIVER ``pdus`` into a :class:`DeliverBatch`
+
+    :param pdus: hex strings or raw ``bytes`` PDUs
+    :param strict: raise on the first undecodable PDU rather than
+                   recording it in :attr:`DeliverBatch.errors`
+    :rtype: :class:`DeliverBatch`
+    """
+    if not isinstance(pdus, (list, tuple)):
+        pdus = list(pdus)
+
+    batch = DeliverBatch(len(pdus))
+    senders = []
+    texts = []
+    sender_offsets = batch.sender_offsets
+    text_offsets = batch.text_offsets
+    sender_off = text_off = 0
+
+    for i, pdu in enumerate(pdus):
+        try:
+            sender, text = _decode_one(batch, i, pdu)
+        except (ValueError, IndexError, TypeError):
+            if strict:
+                raise
+
+            batch.errors.append(i)
+            batch.fmt[i] = 0xFF
+            sender = text = ''
+
+        senders.append(sender)
+        texts.append(text)
+        sender_off += len(sender)
+        text_off += len(text)
+        sender_offsets[i + 1] = sender_off
+        text_offsets[i + 1] = text_off
+
+    batch.senders = ''.join(senders)
+    batch.texts = ''.join(texts)
+    return batch
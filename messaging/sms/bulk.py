@@ -0,0 +1,86 @@
+# See LICENSE
+"""Encoding of large batches of SMS-SUBMIT in a pool of processes"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import os
+
+from messaging.sms.submit import SmsSubmit, _set_options
+
+
+def _encode_one(number, text, options, binary):
+    sms = SmsSubmit(number, text)
+    _set_options(sms, options)
+    return sms.to_pdu(binary=binary)
+
+
+def _encode_chunk(chunk, binary):
+    return [_encode_one(number, text, options, binary)
+            for number, text, options in chunk]
+
+
+def _allocate_refs(requests):
+    # the worker processes have counters of their own, so the references
+    # are allocated here for messages to a number not to share one
+    for number, text, options in requests:
+        sms = SmsSubmit(number, text)
+        _set_options(sms, options)
+        options = dict(options or ())
+        if sms.ref is None:
+            options['ref'] = sms.ref_allocator.allocate(number)
+        options['rand_id'] = sms._get_concat_ref(number)
+        options.pop('ref_allocator', None)
+        options.pop('concat_allocator', None)
+        yield number, text, options
+
+
+def _chunks(requests, chunksize):
+    requests = iter(requests)
+    while True:
+        chunk = list(islice(requests, chunksize))
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def encode_many(requests, workers=None, chunksize=256, binary=False):
+    """
+    Encodes ``requests`` and yields the PDUs of every one of them, in order
+
+    The requests are sent to the worker processes in chunks of
+    ``chunksize``, and at most two chunks per worker are in flight, so
+    ``requests`` can be a generator over millions of messages. The
+    TP-MR and concatenation references that are not set are allocated
+    in this process before, a concatenation reference is then taken for
+    every message, even for those sent in a single segment.
+
+    :param requests: iterable of ``(number, text, options)`` tuples,
+                     ``options`` being None or a dict of
+                     :class:`~messaging.sms.SmsSubmit` attributes to set
+                     (``csca``, ``validity``, ``languages``, ...)
+    :param workers: number of processes, defaults to the number of CPUs.
+                    With 1 or less the requests are encoded in this
+                    process
+    :param binary: yield lists of ``bytes`` rather than of
+                   :class:`~messaging.sms.pdu.Pdu`, see
+                   :meth:`~messaging.sms.SmsSubmit.to_pdu`
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for number, text, options in requests:
+            yield _encode_one(number, text, options, binary)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for chunk in _chunks(_allocate_refs(requests), chunksize):
+            pending.append(executor.submit(_encode_chunk, chunk, binary))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
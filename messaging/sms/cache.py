@@ -0,0 +1,64 @@
+# See LICENSE
+"""Cache of the encoded user data of SMS-SUBMIT messages"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class EncodeCache:
+    """
+    I am a bounded LRU cache of encoded message bodies
+
+    Set me as :attr:`~messaging.sms.SmsSubmit.cache` to share the
+    encoding of identical bodies (text, data coding, class, validity and
+    encoding options) between messages, only the destination address,
+    the TP-MR and the concatenation reference are then encoded.
+
+    :param maxsize: number of bodies kept
+    :param ttl: seconds a body is kept for, None to keep it until it is
+                the least recently used one
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the value cached for ``key``, None if there is none"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._entries[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        expires = None
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
@@ -1,16 +1,22 @@
 # see LICENSE
 """Classes for processing received SMS"""
 
-from datetime import datetime, timedelta
 import logging
 
-from messaging.utils import (swap, swap_number, encode_bytes,
-                             unpack_msg, hex_to_int_array)
+from messaging.utils import (swap_number, encode_bytes, decode_scts,
+                             unpack_msg, hex_to_int_array, udh_septets)
 from messaging.sms import consts
 from messaging.sms.base import SmsBase
+from messaging.sms.gsm0338 import DEFAULT_CHARSET, decode_packed, get_charset
 from messaging.sms.udh import UserDataHeader
 
 
+def _format_scts(d):
+    #  02/08/26 19:37:41
+    return "%02d/%02d/%02d %02d:%02d:%02d" % (d.year % 100, d.month, d.day,
+                                              d.hour, d.minute, d.second)
+
+
 class SmsDeliver(SmsBase):
     """I am a delivered SMS in your Inbox"""
 
@@ -19,6 +25,7 @@ class SmsDeliver(SmsBase):
         self._pdu = None
         self._strict = strict
         self.date = None
+        self.scts = None
         self.mtype = None
         self.sr = None
 
@@ -39,6 +46,7 @@ class SmsDeliver(SmsBase):
             'number': self.number,
             'type': self.type,
             'date': self.date,
+            'scts': self.scts,
             'fmt': self.fmt,
             'sr': self.sr,
         }
@@ -128,52 +136,34 @@ class SmsDeliver(SmsBase):
         elif self.dcs & 0x08:
             self.fmt = 0x08
 
-        datestr = ''
-        # Get date stamp (sender's local time)
-        date = list(encode_bytes(data[:6]))
-        for n in range(1, len(date), 2):
-            date[n - 1], date[n] = date[n], date[n - 1]
-
-        data = data[6:]
-
-        # Get sender's offset from GMT (TS 23.040 TP-SCTS)
-        tz = data.pop(0)
-
-        offset = ((tz & 0x07) * 10 + ((tz & 0xf0) >> 4)) * 15
-        if (tz & 0x08):
-            offset = offset * -1
-
-        #  02/08/26 19:37:41
-        datestr = "%s%s/%s%s/%s%s %s%s:%s%s:%s%s" % tuple(date)
-        outputfmt = '%y/%m/%d %H:%M:%S'
-
-        sndlocaltime = datetime.strptime(datestr, outputfmt)
-        sndoffset = timedelta(minutes=offset)
+        # TP-SCTS, sender's local time and offset from GMT
+        self.scts = decode_scts(data)
+        data = data[7:]
         # date as UTC
-        self.date = sndlocaltime - sndoffset
+        self.date = (self.scts - self.scts.utcoffset()).replace(tzinfo=None)
 
         self._process_message(data)
 
     def _process_message(self, data):
         # Now get message body
         msgl = data.pop(0)
-        msg = encode_bytes(data[:msgl])
         # check for header
-        headlen = ud_len = 0
+        headlen = ud_len = fill_bits = 0
 
         if self.mtype & 0x40:  # UDHI present
             ud_len = data.pop(0)
             self.udh = UserDataHeader.from_bytes(data[:ud_len])
-            headlen = (ud_len + 1) * 8
             if self.fmt == 0x00:
-                while headlen % 7:
-                    headlen += 1
-                headlen /= 7
-
-            headlen = int(headlen)
+                headlen, fill_bits = udh_septets(ud_len + 1)
 
         if self.fmt == 0x00:
-            self.text = unpack_msg(msg)[headlen:msgl].decode("gsm0338")
+            udh = self.udh
+            charset = DEFAULT_CHARSET
+            if udh is not None and (udh.locking_shift or udh.single_shift):
+                charset = get_charset(udh.locking_shift, udh.single_shift)
+
+            self.text = decode_packed(data[ud_len:], msgl - headlen,
+                                      fill_bits, charset=charset)
 
         elif self.fmt == 0x04:
             self.text = data[ud_len:].tobytes()
@@ -201,24 +191,23 @@ class SmsDeliver(SmsBase):
 
         data = data[sndlen:]
 
-        date = swap(list(encode_bytes(data[:7])))
         try:
-            scts_str = "%s%s/%s%s/%s%s %s%s:%s%s:%s%s" % tuple(date[0:12])
-            self.date = datetime.strptime(scts_str, "%y/%m/%d %H:%M:%S")
+            self.scts = decode_scts(data)
+            self.date = self.scts.replace(tzinfo=None)
+            scts_str = _format_scts(self.date)
         except (ValueError, TypeError):
             scts_str = ''
-            logging.debug('Could not decode scts: %s' % date)
+            logging.debug('Could not decode scts: %s' % encode_bytes(data[:7]))
 
         data = data[7:]
 
-        date = swap(list(encode_bytes(data[:7])))
         try:
-            dt_str = "%s%s/%s%s/%s%s %s%s:%s%s:%s%s" % tuple(date[0:12])
-            dt = datetime.strptime(dt_str, "%y/%m/%d %H:%M:%S")
+            dt = decode_scts(data).replace(tzinfo=None)
+            dt_str = _format_scts(dt)
         except (ValueError, TypeError):
             dt_str = ''
             dt = None
-            logging.debug('Could not decode date: %s' % date)
+            logging.debug('Could not decode date: %s' % encode_bytes(data[:7]))
 
         data = data[7:]
 
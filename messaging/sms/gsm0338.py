@@ -16,7 +16,8 @@
 # https://github.com/jezeniel/smsutil/blob/master/smsutil/codecs.py
 import codecs
 from array import array
-import re
+
+from messaging.utils import pack_septets, unpack_septets
 
 # default GSM 03.38 -> unicode
 GSM_BASIC_CHARSET = {
@@ -192,6 +193,164 @@ GSM_REPLACE_CHARSET = {
 
 GSM_CHARSET = {**GSM_BASIC_CHARSET, **GSM_EXT_CHARSET}
 
+# 3GPP TS 23.038 national language identifiers
+TURKISH = 1
+SPANISH = 2
+PORTUGUESE = 3
+
+NATIONAL_LANGUAGE_CODES = {
+    TURKISH: 'tr',
+    SPANISH: 'es',
+    PORTUGUESE: 'pt',
+}
+
+# A.3.1 Turkish National Language Locking Shift Table, differences with
+# the default alphabet
+TURKISH_LOCKING_SHIFT_CHARSET = {**GSM_BASIC_CHARSET, **{
+    '\x04': '\u20AC',  # EURO SIGN
+    '\x07': '\u0131',  # LATIN SMALL LETTER DOTLESS I
+    '\x0B': '\u011E',  # LATIN CAPITAL LETTER G WITH BREVE
+    '\x0C': '\u011F',  # LATIN SMALL LETTER G WITH BREVE
+    '\x1C': '\u015E',  # LATIN CAPITAL LETTER S WITH CEDILLA
+    '\x1D': '\u015F',  # LATIN SMALL LETTER S WITH CEDILLA
+    '\x40': '\u0130',  # LATIN CAPITAL LETTER I WITH DOT ABOVE
+    '\x60': '\u00E7',  # LATIN SMALL LETTER C WITH CEDILLA
+}}
+
+# A.3.3 Portuguese National Language Locking Shift Table, differences
+# with the default alphabet
+PORTUGUESE_LOCKING_SHIFT_CHARSET = {**GSM_BASIC_CHARSET, **{
+    '\x04': '\u00EA',  # LATIN SMALL LETTER E WITH CIRCUMFLEX
+    '\x06': '\u00FA',  # LATIN SMALL LETTER U WITH ACUTE
+    '\x07': '\u00ED',  # LATIN SMALL LETTER I WITH ACUTE
+    '\x08': '\u00F3',  # LATIN SMALL LETTER O WITH ACUTE
+    '\x09': '\u00E7',  # LATIN SMALL LETTER C WITH CEDILLA
+    '\x0B': '\u00D4',  # LATIN CAPITAL LETTER O WITH CIRCUMFLEX
+    '\x0C': '\u00F4',  # LATIN SMALL LETTER O WITH CIRCUMFLEX
+    '\x0E': '\u00C1',  # LATIN CAPITAL LETTER A WITH ACUTE
+    '\x0F': '\u00E1',  # LATIN SMALL LETTER A WITH ACUTE
+    '\x12': '\u00AA',  # FEMININE ORDINAL INDICATOR
+    '\x13': '\u00C7',  # LATIN CAPITAL LETTER C WITH CEDILLA
+    '\x14': '\u00C0',  # LATIN CAPITAL LETTER A WITH GRAVE
+    '\x15': '\u221E',  # INFINITY
+    '\x16': '\u005E',  # CIRCUMFLEX ACCENT
+    '\x17': '\u005C',  # REVERSE SOLIDUS
+    '\x18': '\u20AC',  # EURO SIGN
+    '\x19': '\u00D3',  # LATIN CAPITAL LETTER O WITH ACUTE
+    '\x1A': '\u007C',  # VERTICAL LINE
+    '\x1C': '\u00C2',  # LATIN CAPITAL LETTER A WITH CIRCUMFLEX
+    '\x1D': '\u00E2',  # LATIN SMALL LETTER A WITH CIRCUMFLEX
+    '\x1E': '\u00CA',  # LATIN CAPITAL LETTER E WITH CIRCUMFLEX
+    '\x24': '\u00BA',  # MASCULINE ORDINAL INDICATOR
+    '\x40': '\u00CD',  # LATIN CAPITAL LETTER I WITH ACUTE
+    '\x5B': '\u00C3',  # LATIN CAPITAL LETTER A WITH TILDE
+    '\x5C': '\u00D5',  # LATIN CAPITAL LETTER O WITH TILDE
+    '\x5D': '\u00DA',  # LATIN CAPITAL LETTER U WITH ACUTE
+    '\x60': '\u007E',  # TILDE
+    '\x7B': '\u00E3',  # LATIN SMALL LETTER A WITH TILDE
+    '\x7C': '\u00F5',  # LATIN SMALL LETTER O WITH TILDE
+    '\x7D': '\u0060',  # GRAVE ACCENT
+}}
+
+# A.2.1 Turkish National Language Single Shift Table
+TURKISH_SINGLE_SHIFT_CHARSET = {
+    '\x1B\x0A': '\u000C',  # FORM FEED
+    '\x1B\x14': '\u005E',  # CIRCUMFLEX ACCENT
+    '\x1B\x28': '\u007B',  # LEFT CURLY BRACKET
+    '\x1B\x29': '\u007D',  # RIGHT CURLY BRACKET
+    '\x1B\x2F': '\u005C',  # REVERSE SOLIDUS
+    '\x1B\x3C': '\u005B',  # LEFT SQUARE BRACKET
+    '\x1B\x3D': '\u007E',  # TILDE
+    '\x1B\x3E': '\u005D',  # RIGHT SQUARE BRACKET
+    '\x1B\x40': '\u007C',  # VERTICAL LINE
+    '\x1B\x47': '\u011E',  # LATIN CAPITAL LETTER G WITH BREVE
+    '\x1B\x49': '\u0130',  # LATIN CAPITAL LETTER I WITH DOT ABOVE
+    '\x1B\x53': '\u015E',  # LATIN CAPITAL LETTER S WITH CEDILLA
+    '\x1B\x63': '\u00E7',  # LATIN SMALL LETTER C WITH CEDILLA
+    '\x1B\x65': '\u20AC',  # EURO SIGN
+    '\x1B\x67': '\u011F',  # LATIN SMALL LETTER G WITH BREVE
+    '\x1B\x69': '\u0131',  # LATIN SMALL LETTER DOTLESS I
+    '\x1B\x73': '\u015F',  # LATIN SMALL LETTER S WITH CEDILLA
+}
+
+# A.2.2 Spanish National Language Single Shift Table
+SPANISH_SINGLE_SHIFT_CHARSET = {
+    '\x1B\x09': '\u00E7',  # LATIN SMALL LETTER C WITH CEDILLA
+    '\x1B\x0A': '\u000C',  # FORM FEED
+    '\x1B\x14': '\u005E',  # CIRCUMFLEX ACCENT
+    '\x1B\x28': '\u007B',  # LEFT CURLY BRACKET
+    '\x1B\x29': '\u007D',  # RIGHT CURLY BRACKET
+    '\x1B\x2F': '\u005C',  # REVERSE SOLIDUS
+    '\x1B\x3C': '\u005B',  # LEFT SQUARE BRACKET
+    '\x1B\x3D': '\u007E',  # TILDE
+    '\x1B\x3E': '\u005D',  # RIGHT SQUARE BRACKET
+    '\x1B\x40': '\u007C',  # VERTICAL LINE
+    '\x1B\x41': '\u00C1',  # LATIN CAPITAL LETTER A WITH ACUTE
+    '\x1B\x49': '\u00CD',  # LATIN CAPITAL LETTER I WITH ACUTE
+    '\x1B\x4F': '\u00D3',  # LATIN CAPITAL LETTER O WITH ACUTE
+    '\x1B\x55': '\u00DA',  # LATIN CAPITAL LETTER U WITH ACUTE
+    '\x1B\x61': '\u00E1',  # LATIN SMALL LETTER A WITH ACUTE
+    '\x1B\x65': '\u20AC',  # EURO SIGN
+    '\x1B\x69': '\u00ED',  # LATIN SMALL LETTER I WITH ACUTE
+    '\x1B\x6F': '\u00F3',  # LATIN SMALL LETTER O WITH ACUTE
+    '\x1B\x75': '\u00FA',  # LATIN SMALL LETTER U WITH ACUTE
+}
+
+# A.2.3 Portuguese National Language Single Shift Table
+PORTUGUESE_SINGLE_SHIFT_CHARSET = {
+    '\x1B\x05': '\u00EA',  # LATIN SMALL LETTER E WITH CIRCUMFLEX
+    '\x1B\x09': '\u00E7',  # LATIN SMALL LETTER C WITH CEDILLA
+    '\x1B\x0A': '\u000C',  # FORM FEED
+    '\x1B\x0B': '\u00D4',  # LATIN CAPITAL LETTER O WITH CIRCUMFLEX
+    '\x1B\x0C': '\u00F4',  # LATIN SMALL LETTER O WITH CIRCUMFLEX
+    '\x1B\x0E': '\u00C1',  # LATIN CAPITAL LETTER A WITH ACUTE
+    '\x1B\x0F': '\u00E1',  # LATIN SMALL LETTER A WITH ACUTE
+    '\x1B\x12': '\u03A6',  # GREEK CAPITAL LETTER PHI
+    '\x1B\x13': '\u0393',  # GREEK CAPITAL LETTER GAMMA
+    '\x1B\x14': '\u005E',  # CIRCUMFLEX ACCENT
+    '\x1B\x15': '\u03A9',  # GREEK CAPITAL LETTER OMEGA
+    '\x1B\x16': '\u03A0',  # GREEK CAPITAL LETTER PI
+    '\x1B\x17': '\u03A8',  # GREEK CAPITAL LETTER PSI
+    '\x1B\x18': '\u03A3',  # GREEK CAPITAL LETTER SIGMA
+    '\x1B\x19': '\u0398',  # GREEK CAPITAL LETTER THETA
+    '\x1B\x1F': '\u00CA',  # LATIN CAPITAL LETTER E WITH CIRCUMFLEX
+    '\x1B\x28': '\u007B',  # LEFT CURLY BRACKET
+    '\x1B\x29': '\u007D',  # RIGHT CURLY BRACKET
+    '\x1B\x2F': '\u005C',  # REVERSE SOLIDUS
+    '\x1B\x3C': '\u005B',  # LEFT SQUARE BRACKET
+    '\x1B\x3D': '\u007E',  # TILDE
+    '\x1B\x3E': '\u005D',  # RIGHT SQUARE BRACKET
+    '\x1B\x40': '\u007C',  # VERTICAL LINE
+    '\x1B\x41': '\u00C0',  # LATIN CAPITAL LETTER A WITH GRAVE
+    '\x1B\x49': '\u00CD',  # LATIN CAPITAL LETTER I WITH ACUTE
+    '\x1B\x4F': '\u00D3',  # LATIN CAPITAL LETTER O WITH ACUTE
+    '\x1B\x55': '\u00DA',  # LATIN CAPITAL LETTER U WITH ACUTE
+    '\x1B\x5B': '\u00C3',  # LATIN CAPITAL LETTER A WITH TILDE
+    '\x1B\x5C': '\u00D5',  # LATIN CAPITAL LETTER O WITH TILDE
+    '\x1B\x61': '\u00C2',  # LATIN SMALL LETTER A WITH CIRCUMFLEX
+    '\x1B\x65': '\u20AC',  # EURO SIGN
+    '\x1B\x69': '\u00ED',  # LATIN SMALL LETTER I WITH ACUTE
+    '\x1B\x6F': '\u00F3',  # LATIN SMALL LETTER O WITH ACUTE
+    '\x1B\x75': '\u00FA',  # LATIN SMALL LETTER U WITH ACUTE
+    '\x1B\x7B': '\u00E3',  # LATIN SMALL LETTER A WITH TILDE
+    '\x1B\x7C': '\u00F5',  # LATIN SMALL LETTER O WITH TILDE
+    '\x1B\x7F': '\u00E2',  # LATIN SMALL LETTER A WITH CIRCUMFLEX
+}
+
+# national language identifier -> table, 0 is the default alphabet
+LOCKING_SHIFT_CHARSETS = {
+    0: GSM_BASIC_CHARSET,
+    TURKISH: TURKISH_LOCKING_SHIFT_CHARSET,
+    PORTUGUESE: PORTUGUESE_LOCKING_SHIFT_CHARSET,
+}
+
+SINGLE_SHIFT_CHARSETS = {
+    0: GSM_EXT_CHARSET,
+    TURKISH: TURKISH_SINGLE_SHIFT_CHARSET,
+    SPANISH: SPANISH_SINGLE_SHIFT_CHARSET,
+    PORTUGUESE: PORTUGUESE_SINGLE_SHIFT_CHARSET,
+}
+
 QUESTION_MARK = ord('\u003F')
 ESCAPE = ord('\x1B')
 NBSP = ord('\u00A0')
@@ -204,76 +363,321 @@ ext_encoding_map = dict((ord(v), ord(k[1])) for k, v in GSM_EXT_CHARSET.items())
 
 replace_encode_map = dict((ord(k), ord(v)) for k, v in GSM_REPLACE_CHARSET.items())
 
-def encode_gsm0338(text, errors, encoding_map, ext_encoding_map, replace_encode_map):
-    encoded = b''
-    for char in text:
-        ochar = ord(char)
-        ec = b''
-        if ochar in encoding_map:
-            ec = encoding_map.get(ochar)
-        else:
-            if ochar in ext_encoding_map:
-                encoded += bytes([ESCAPE])
-                ec = ext_encoding_map.get(ochar)
-            elif errors == 'strict':
-                raise UnicodeError("Invalid GSM character")
+
+class _MissingTable(dict):
+    """str.translate table with a fallback for unmapped code points"""
+
+    def __init__(self, table, default):
+        super(_MissingTable, self).__init__(table)
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+
+class GSMCharset:
+    """
+    Precomputed translate tables for a GSM 7 bit alphabet
+
+    :param basic: GSM character -> unicode for the (locking shift) table
+    :param ext: ESC + GSM character -> unicode for the single shift table
+    :param replace: unicode -> GSM character used by ``errors='replace'``
+    """
+
+    def __init__(self, basic, ext, replace=None):
+        replace = replace or {}
+
+        # unicode -> GSM chars, ESC prefixed for the extension table
+        encode = {}
+        for k, v in ext.items():
+            encode[ord(v)] = k
+        for k, v in basic.items():
+            if k != '\x1B':
+                encode[ord(v)] = k
+
+        # everything in the ASCII range is mapped so that a single
+        # .encode('ascii') spots any unmapped character
+        strict = dict(encode)
+        for i in range(0x80):
+            strict.setdefault(i, '\uFFFD')
+
+        substitutes = dict(encode)
+        for k, v in replace.items():
+            substitutes.setdefault(ord(k), v)
+        for i in range(0x80):
+            substitutes.setdefault(i, '?')
+
+        dropped = dict(encode)
+        for i in range(0x80):
+            dropped.setdefault(i, None)
+
+        self.basic = basic
+        self.ext = ext
+        self.encode_table = encode
+        # every encodable character, and a table deleting them so that
+        # only the unencodable characters are left after a translate
+        self.chars = frozenset(map(chr, encode))
+        self._unencodable = dict.fromkeys(encode)
+        self._strict = strict
+        self._replace = _MissingTable(substitutes, '?')
+        self._ignore = _MissingTable(dropped, None)
+
+        # GSM octet -> unicode, octets with the MSB set are invalid
+        decode = dict((ord(k), v) for k, v in basic.items())
+        decode[ESCAPE] = chr(NBSP)
+        self.decode_table = decode
+        self._ext_decode = dict((ord(k[1]), v) for k, v in ext.items())
+
+    def encode(self, text, errors='strict'):
+        """Encodes ``text``, returns one GSM character per octet"""
+        try:
+            return text.translate(self._strict).encode('ascii')
+        except UnicodeEncodeError:
+            pass
+
+        if errors == 'strict':
+            raise UnicodeError("Invalid GSM character")
+        elif errors == 'replace':
+            return text.translate(self._replace).encode('ascii')
+        elif errors == 'ignore':
+            return text.translate(self._ignore).encode('ascii')
+
+        raise UnicodeError("Unknown error handling")
+
+    def find_unencodable(self, text):
+        """Returns the index of the first unencodable character or -1"""
+        unencodable = text.translate(self._unencodable)
+        if not unencodable:
+            return -1
+
+        return text.index(unencodable[0])
+
+    def _decode_basic(self, data, errors):
+        text = data.decode('latin-1')
+        if not data.isascii():
+            if errors == 'strict':
+                pos = next(i for i, o in enumerate(data) if o > 0x7F)
+                raise UnicodeDecodeError('gsm0338', data, pos, pos + 1,
+                                         "Invalid GSM character")
             elif errors == 'replace':
-                ec = replace_encode_map.get(ochar, QUESTION_MARK)
+                return text.translate(_MissingTable(self.decode_table,
+                                                    '\uFFFD'))
             elif errors == 'ignore':
-                pass
+                return text.translate(_MissingTable(self.decode_table,
+                                                    None))
+
+            raise UnicodeError("Unknown error handling")
+
+        return text.translate(self.decode_table)
+
+    def decode(self, data, errors='strict'):
+        """Decodes ``data``, one GSM character per octet"""
+        data = bytes(data)
+        if ESCAPE not in data:
+            return self._decode_basic(data, errors)
+
+        parts = data.split(b'\x1B')
+        decoded = [self._decode_basic(parts[0], errors)]
+        ext_decode = self._ext_decode
+        for part in parts[1:]:
+            if not part:
+                # ESC at the end of the data or followed by another ESC
+                decoded.append(chr(NBSP))
+                continue
+
+            ext = ext_decode.get(part[0])
+            if ext is None:
+                # invalid escape sequence
+                decoded.append(chr(NBSP))
+                decoded.append(self._decode_basic(part, errors))
             else:
-                raise UnicodeError("Unknown error handling")
-        if isinstance(ec, int):
-            ec = bytes([ec])
-        encoded += ec
-    return encoded, len(encoded)
-
-def decode_gsm0338(text, decoding_map):
-    decoded = ''
-    skip = None
-    for index, char in enumerate(bytes(text)):
-        next_char = index + 1
-        if skip == index:
-            continue
-        if char != ESCAPE:
-            d = decoding_map.get(char)
-        elif char == ESCAPE and next_char < len(text):
-            ext_char = bytes([ESCAPE, text[next_char]])
-            d = decoding_map.get(ext_char, NBSP)
-            if d != NBSP:
-                skip = next_char
-        else:
-            d = NBSP
-        decoded += chr(d)
-    return decoded, len(decoded)
+                decoded.append(ext)
+                decoded.append(self._decode_basic(part[1:], errors))
+
+        return ''.join(decoded)
+
+
+DEFAULT_CHARSET = GSMCharset(GSM_BASIC_CHARSET, GSM_EXT_CHARSET,
+                             GSM_REPLACE_CHARSET)
+
+_charsets = {(0, 0): DEFAULT_CHARSET}
+
+
+def get_charset(locking_shift=0, single_shift=0):
+    """
+    Returns the :class:`GSMCharset` for the given national languages
+
+    Unknown national language identifiers fall back to the default
+    alphabet and extension table
+
+    :param locking_shift: national language identifier of the locking
+                          shift table, 0 for the default alphabet
+    :param single_shift: national language identifier of the single
+                         shift table, 0 for the default extension table
+    """
+    locking_shift = locking_shift or 0
+    if locking_shift not in LOCKING_SHIFT_CHARSETS:
+        locking_shift = 0
+
+    single_shift = single_shift or 0
+    if single_shift not in SINGLE_SHIFT_CHARSETS:
+        single_shift = 0
+
+    key = (locking_shift, single_shift)
+    charset = _charsets.get(key)
+    if charset is None:
+        charset = GSMCharset(LOCKING_SHIFT_CHARSETS[locking_shift],
+                             SINGLE_SHIFT_CHARSETS[single_shift],
+                             GSM_REPLACE_CHARSET)
+        _charsets[key] = charset
+
+    return charset
+
+
+def encode_gsm0338(text, errors='strict', charset=DEFAULT_CHARSET):
+    return charset.encode(text, errors), len(text)
+
+
+def decode_gsm0338(data, errors='strict', charset=DEFAULT_CHARSET):
+    return charset.decode(data, errors), len(data)
+
+
+def encode_packed(text, fill_bits=0, errors='strict',
+                  charset=DEFAULT_CHARSET):
+    """
+    Encodes ``text`` straight into packed septets
+
+    :param fill_bits: number of zero bits preceding the first septet,
+                      to align the text after a UDH
+    :rtype: bytes
+    """
+    return pack_septets(charset.encode(text, errors), fill_bits)
+
+
+def decode_packed(data, count=None, fill_bits=0, errors='strict',
+                  charset=DEFAULT_CHARSET):
+    """
+    Decodes the packed septets in ``data``
+
+    :param count: number of septets (the UDL minus the septets taken by
+                  the UDH), defaults to as many as fit in ``data``
+    :param fill_bits: number of fill bits preceding the first septet
+    """
+    return charset.decode(unpack_septets(data, count, fill_bits), errors)
+
+
+# 3GPP TS 23.038 6.1.2.3.1: when the last octet has 7 spare bits they
+# hold a CR, which the receiver discards. A text ending with a CR on an
+# octet boundary gets a second CR, so that its own is not discarded.
+PACKED_PADDING = b'\x0D'
+
+
+def encode_gsm0338_packed(text, errors='strict'):
+    septets = DEFAULT_CHARSET.encode(text, errors)
+    if len(septets) % 8 == 7 or (len(septets) % 8 == 0 and
+                                 septets.endswith(PACKED_PADDING)):
+        septets += PACKED_PADDING
+
+    return pack_septets(septets), len(text)
+
+
+def decode_gsm0338_packed(data, errors='strict'):
+    data = bytes(data)
+    septets = unpack_septets(data)
+    if len(data) % 7 == 0 and septets.endswith(PACKED_PADDING):
+        septets = septets[:-1]
+
+    return DEFAULT_CHARSET.decode(septets, errors), len(data)
 
 
 class GSM0338Codec(codecs.Codec):
+    charset = DEFAULT_CHARSET
+
     def encode(self, input_, errors='strict'):
-        return encode_gsm0338(input_, errors, encoding_map, ext_encoding_map, replace_encode_map)
+        return encode_gsm0338(input_, errors, self.charset)
 
     def decode(self, input_, errors='strict'):
-        return decode_gsm0338(input_, decoding_map)
+        return decode_gsm0338(input_, errors, self.charset)
 
 
 class GSM0338IncrementalEncoder(codecs.IncrementalEncoder):
+    # every character is encoded on its own, there is no state to keep
+    charset = DEFAULT_CHARSET
+
     def encode(self, input_, final=False):
-        return encode_gsm0338(input_, self.errors, encoding_map, ext_encoding_map, replace_encode_map)[0]
+        return self.charset.encode(input_, self.errors)
 
 
-class GSM0338IncrementalDecoder(codecs.IncrementalDecoder):
-    def decode(self, input_, final=False):
-        return decode_gsm0338(input_, decoding_map)[0]
+def _decode_chunk(charset, data, errors, final):
+    """
+    Decodes ``data`` but a trailing ESC, unless ``final``
 
+    The ESC can only be decoded along with the octet that follows it in
+    the next chunk
+    """
+    data = bytes(data)
+    if not final and data.endswith(b'\x1B'):
+        return charset.decode(data[:-1], errors), len(data) - 1
+
+    return charset.decode(data, errors), len(data)
+
+
+class GSM0338IncrementalDecoder(codecs.BufferedIncrementalDecoder):
+    # getstate()/setstate() return and restore the buffered ESC, if any
+    charset = DEFAULT_CHARSET
+
+    def _buffer_decode(self, input_, errors, final):
+        return _decode_chunk(self.charset, input_, errors, final)
 
-class GSM0338StreamReader(GSM0338Codec, codecs.StreamReader):
-    pass
+
+class GSM0338StreamReader(codecs.StreamReader):
+    # a trailing ESC is kept in the byte buffer until more data is read
+    charset = DEFAULT_CHARSET
+
+    def decode(self, input_, errors='strict'):
+        # read() hands the byte buffer alone when the stream is exhausted
+        final = bool(self.bytebuffer) and input_ == self.bytebuffer
+        return _decode_chunk(self.charset, input_, errors, final)
 
 
 class GSM0338StreamWriter(GSM0338Codec, codecs.StreamWriter):
     pass
 
 
+def _codec_info(name, charset):
+    attrs = {'charset': charset}
+    codec = type('Codec', (GSM0338Codec,), attrs)()
+    return codecs.CodecInfo(
+        name=name,
+        encode=codec.encode,
+        decode=codec.decode,
+        incrementalencoder=type('IncrementalEncoder',
+                                (GSM0338IncrementalEncoder,), attrs),
+        incrementaldecoder=type('IncrementalDecoder',
+                                (GSM0338IncrementalDecoder,), attrs),
+        streamwriter=type('StreamWriter', (GSM0338StreamWriter,), attrs),
+        streamreader=type('StreamReader', (GSM0338StreamReader,), attrs),
+    )
+
+
+def _national_codec_names():
+    # gsm0338-<lang>: both shift tables when available
+    # gsm0338-<lang>-single: default alphabet + national single shift
+    # gsm0338-<lang>-locking: national locking shift + default extension
+    names = {}
+    for lang, code in NATIONAL_LANGUAGE_CODES.items():
+        locking = lang if lang in LOCKING_SHIFT_CHARSETS else 0
+        names['gsm0338-%s' % code] = (locking, lang)
+        names['gsm0338-%s-single' % code] = (0, lang)
+        if locking:
+            names['gsm0338-%s-locking' % code] = (lang, 0)
+
+    return names
+
+
+NATIONAL_CODECS = _national_codec_names()
+
+
 def search_gsm0338(encoding):
     if encoding in ('gsm0338', 'gsm7'):
         return codecs.CodecInfo(
@@ -285,13 +689,26 @@ def search_gsm0338(encoding):
             streamwriter=GSM0338StreamWriter,
             streamreader=GSM0338StreamReader
         )
+
+    name = encoding.replace('_', '-')
+    if name == 'gsm0338-packed':
+        # the septet count is not known, so there are no incremental
+        # or stream codecs
+        return codecs.CodecInfo(
+            name=name,
+            encode=encode_gsm0338_packed,
+            decode=decode_gsm0338_packed,
+        )
+
+    if name in NATIONAL_CODECS:
+        return _codec_info(name, get_charset(*NATIONAL_CODECS[name]))
+
     return None
 
 
 def is_valid_gsm(text):
-    ''' Validate if `text` is a valid gsm 03.338.  '''
-    r = '^[' + re.escape(''.join(list(GSM_CHARSET.values()))) + ']+$'
-    return re.match(r, text, re.UNICODE) is not None
+    ''' Validate if `text` is a non empty valid gsm 03.338.  '''
+    return bool(text) and DEFAULT_CHARSET.chars.issuperset(text)
 
 
-codecs.register(search_gsm0338)
\ No newline at end of file
+codecs.register(search_gsm0338)
@@ -0,0 +1,254 @@
+# See LICENSE
+"""asyncio driver for AT modems sending and receiving SMS in PDU mode"""
+
+import asyncio
+import os
+import tty
+
+from messaging.sms.at import ResponseParser
+
+CTRL_Z = b'\x1a'
+
+
+class ModemError(Exception):
+    """The modem answered with ERROR, +CMS ERROR or +CME ERROR"""
+
+
+class _Command:
+    __slots__ = ('future', 'prompt', 'lines', 'messages')
+
+    def __init__(self, loop, prompt):
+        self.future = loop.create_future()
+        self.prompt = loop.create_future() if prompt else None
+        self.lines = []
+        self.messages = []
+
+
+class _Parser(ResponseParser):
+
+    def __init__(self, protocol):
+        super(_Parser, self).__init__()
+        self.protocol = protocol
+
+    def line_received(self, line):
+        self.protocol._line_received(line)
+
+
+class ModemProtocol(asyncio.Protocol):
+    """
+    I drive a modem in PDU mode (``AT+CMGF=0``) over any asyncio transport
+
+    Commands are serialised, so any number of coroutines can share a
+    modem, and one event loop can drive as many modems as needed. The
+    segments of a message are sent back to back while the modem is
+    held. Unsolicited ``+CMT``/``+CDS`` PDUs are passed to
+    :meth:`message_received`, which queues them in :attr:`messages` by
+    default.
+
+    Use :func:`open_serial` for a local tty, or any other transport
+    factory (e.g. pyserial-asyncio) with this protocol.
+    """
+
+    def __init__(self, timeout=60):
+        self.transport = None
+        self.timeout = timeout
+        self.messages = asyncio.Queue()
+        self._parser = _Parser(self)
+        self._lock = asyncio.Lock()
+        self._pending = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.transport = None
+        pending = self._pending
+        if pending is not None:
+            err = ModemError("Connection lost")
+            for future in (pending.prompt, pending.future):
+                if future is not None and not future.done():
+                    future.set_exception(err)
+
+    def data_received(self, data):
+        for msg in self._parser.feed(data):
+            if self._pending is not None and msg.kind in ('CMGL', 'CMGR'):
+                self._pending.messages.append(msg)
+            else:
+                self.message_received(msg)
+
+        pending = self._pending
+        if (pending is not None and pending.prompt is not None and
+                not pending.prompt.done() and
+                self._parser.partial_line.strip() == b'>'):
+            pending.prompt.set_result(None)
+
+    def _line_received(self, line):
+        pending = self._pending
+        if pending is None or pending.future.done():
+            self.result_code_received(line)
+        elif line == b'OK':
+            pending.future.set_result(pending)
+        elif (line == b'ERROR' or line.startswith(b'+CMS ERROR:') or
+                line.startswith(b'+CME ERROR:')):
+            pending.future.set_exception(ModemError(line.decode('ascii')))
+        else:
+            pending.lines.append(line)
+
+    def message_received(self, msg):
+        """
+        Called with a :class:`~messaging.sms.at.ModemMessage` for every
+        unsolicited ``+CMT``/``+CDS`` notification
+        """
+        self.messages.put_nowait(msg)
+
+    def result_code_received(self, line):
+        """Called for unsolicited lines other than PDUs (RING, +CMTI, ...)"""
+
+    async def _execute(self, cmd, pdu=None, timeout=None):
+        if self.transport is None:
+            raise ModemError("Not connected")
+
+        if timeout is None:
+            timeout = self.timeout
+
+        loop = asyncio.get_running_loop()
+        pending = self._pending = _Command(loop, pdu is not None)
+        try:
+            self.transport.write(cmd + b'\r')
+            if pdu is not None:
+                await self._wait_prompt(pending, timeout)
+                self.transport.write(pdu + CTRL_Z)
+            await asyncio.wait_for(pending.future, timeout)
+        finally:
+            self._pending = None
+
+        return pending
+
+    async def _wait_prompt(self, pending, timeout):
+        # the modem answers with an error rather than the prompt when,
+        # e.g., it is not registered
+        done, _ = await asyncio.wait((pending.prompt, pending.future),
+                                     timeout=timeout,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            raise asyncio.TimeoutError()
+
+        if pending.future.done():
+            pending.future.result()
+            raise ModemError("OK received instead of the prompt")
+
+        pending.prompt.result()
+
+    async def command(self, cmd, timeout=None):
+        """
+        Sends ``cmd`` and returns the lines of its response
+
+        :param cmd: the command without its trailing ``\\r``
+        :type cmd: bytes
+        :raise ModemError: if the modem reports an error
+        """
+        async with self._lock:
+            pending = await self._execute(cmd, timeout=timeout)
+
+        return pending.lines
+
+    async def list_messages(self, stat=4, timeout=None):
+        """Returns the stored messages with status ``stat`` (AT+CMGL)"""
+        async with self._lock:
+            pending = await self._execute(b'AT+CMGL=%d' % stat,
+                                          timeout=timeout)
+
+        return pending.messages
+
+    async def _send_pdu(self, pdu, timeout):
+        cmd = b'AT+CMGS=%d' % pdu.length
+        pending = await self._execute(cmd, pdu.pdu.encode('ascii'), timeout)
+        for line in pending.lines:
+            if line.startswith(b'+CMGS:'):
+                # +CMGS: <mr>[,<scts>]
+                return int(line[6:].split(b',')[0])
+
+        return None
+
+    async def send(self, sms, more_messages=False, timeout=None):
+        """
+        Sends ``sms`` and returns the TP-MR of every segment
+
+        :param sms: a :class:`~messaging.sms.SmsSubmit` or the list of
+                    :class:`~messaging.sms.pdu.Pdu` it produced
+        :param more_messages: keep the relay link open between segments
+                              (``AT+CMMS=1``), if the modem supports it
+        :rtype: list
+        """
+        pdus = sms.to_pdu() if hasattr(sms, 'to_pdu') else sms
+        refs = []
+        async with self._lock:
+            if more_messages and len(pdus) > 1:
+                await self._execute(b'AT+CMMS=1', timeout=timeout)
+
+            for pdu in pdus:
+                refs.append(await self._send_pdu(pdu, timeout))
+
+        return refs
+
+
+class _SerialTransport(asyncio.Transport):
+    """Joins the read and write pipe transports of a tty"""
+
+    def __init__(self, reader, writer):
+        super(_SerialTransport, self).__init__()
+        self._reader = reader
+        self._writer = writer
+
+    def write(self, data):
+        self._writer.write(data)
+
+    def is_closing(self):
+        return self._reader.is_closing()
+
+    def close(self):
+        self._writer.close()
+        self._reader.close()
+
+    def get_extra_info(self, name, default=None):
+        return self._reader.get_extra_info(name, default)
+
+
+class _ReadPipeProtocol(asyncio.Protocol):
+
+    def __init__(self, protocol, writer):
+        self.protocol = protocol
+        self.writer = writer
+
+    def connection_made(self, transport):
+        self.protocol.connection_made(_SerialTransport(transport,
+                                                       self.writer))
+
+    def data_received(self, data):
+        self.protocol.data_received(data)
+
+    def eof_received(self):
+        return self.protocol.eof_received()
+
+    def connection_lost(self, exc):
+        self.writer.close()
+        self.protocol.connection_lost(exc)
+
+
+async def open_serial(path, protocol_factory=ModemProtocol):
+    """
+    Opens the tty at ``path`` in raw mode and connects a protocol to it
+
+    :return: the protocol instance
+    """
+    loop = asyncio.get_running_loop()
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd)
+    rfile = os.fdopen(fd, 'rb', buffering=0)
+    wfile = os.fdopen(os.dup(fd), 'wb', buffering=0)
+
+    protocol = protocol_factory()
+    writer, _ = await loop.connect_write_pipe(asyncio.BaseProtocol, wfile)
+    await loop.connect_read_pipe(lambda: _ReadPipeProtocol(protocol, writer),
+                                 rfile)
+    return protocol
@@ -8,3 +8,18 @@ class Pdu:
         self.length = len(pdu) / 2 - len_smsc
         self.cnt = cnt
         self.seq = seq
+
+
+class SmppSegment:
+    """The SMPP ``submit_sm`` fields of a segment"""
+    __slots__ = ('data_coding', 'esm_class', 'short_message')
+
+    def __init__(self, data_coding, esm_class, short_message):
+        self.data_coding = data_coding
+        self.esm_class = esm_class
+        self.short_message = short_message
+
+    def __repr__(self):
+        args = (self.data_coding, self.esm_class, len(self.short_message))
+        return ("<SmppSegment data_coding: %d esm_class: %d "
+                "short_message: %d octets>" % args)
@@ -0,0 +1,379 @@
+# See LICENSE
+"""Choice of the cheapest encoding and segmentation of an SMS-SUBMIT"""
+
+from collections import Counter
+
+from messaging.sms import consts
+from messaging.sms.gsm0338 import (DEFAULT_CHARSET, get_charset,
+                                   LOCKING_SHIFT_CHARSETS,
+                                   SINGLE_SHIFT_CHARSETS)
+from messaging.sms.segmentation import split_septets, split_text, utf16_len
+from messaging.sms.udh import UserDataHeader
+
+# IE lengths, IEI and IEDL included
+CONCAT_IE_LEN = 5
+CONCAT16_IE_LEN = 6
+SHIFT_IE_LEN = 3
+
+
+def get_capacity(fmt, udh_len=0):
+    """
+    Returns how many septets/octets/characters fit in one segment
+
+    :param fmt: 0x00 (7 bit), 0x04 (8 bit) or 0x08 (UCS2)
+    :param udh_len: length of the UDH, UDHL octet included
+    """
+    octets = consts.EIGHTBIT_SIZE - udh_len
+    if fmt == 0x00:
+        # the UDH and its fill bits take up whole septets
+        return octets * 8 // 7
+    elif fmt == 0x04:
+        return octets
+
+    return octets // 2
+
+
+def get_udh_len(concat=False, locking_shift=None, single_shift=None,
+                udh_extra=0, concat_bits=8):
+    """
+    Returns the length of the UDH holding the given IEs, UDHL included
+
+    :param udh_extra: length of any other IEs (application ports, ...)
+    :param concat_bits: 8 or 16, size of the concatenation reference
+    """
+    ies = udh_extra
+    if concat:
+        ies += CONCAT_IE_LEN if concat_bits == 8 else CONCAT16_IE_LEN
+    if locking_shift:
+        ies += SHIFT_IE_LEN
+    if single_shift:
+        ies += SHIFT_IE_LEN
+
+    return ies + 1 if ies else 0
+
+
+class EncodingPlan:
+    """
+    I am the encoding chosen for a text and its split into segments
+
+    ``data`` holds the GSM characters (``bytes``) for 7 bit messages and
+    the text itself otherwise, ``segments`` is a list of ``(start, end)``
+    offsets in ``data``. ``locking_shift`` and ``single_shift`` are the
+    national language identifiers of the shift tables, if any.
+    """
+    __slots__ = ('fmt', 'locking_shift', 'single_shift', 'text', 'data',
+                 'segments', 'transliterated')
+
+    def __init__(self, fmt, text, data, segments, locking_shift=None,
+                 single_shift=None, transliterated=False):
+        self.fmt = fmt
+        self.text = text
+        self.data = data
+        self.segments = segments
+        self.locking_shift = locking_shift
+        self.single_shift = single_shift
+        self.transliterated = transliterated
+
+    def __repr__(self):
+        args = (self.fmt, len(self.segments), self.locking_shift,
+                self.single_shift)
+        return ("<EncodingPlan fmt: %d segments: %d locking_shift: %s "
+                "single_shift: %s>" % args)
+
+    def get_udh(self, concat=None):
+        """Returns the UDH of a segment, or None if it needs none"""
+        if self.fmt == 0x00 and (self.locking_shift or self.single_shift):
+            udh = UserDataHeader(concat=concat)
+            udh.locking_shift = self.locking_shift or None
+            udh.single_shift = self.single_shift or None
+            return udh
+
+        if concat is not None:
+            return UserDataHeader(concat=concat)
+
+        return None
+
+
+def _capacities(fmt, locking_shift=None, single_shift=None, udh_extra=0,
+                concat_bits=8):
+    """Returns the capacity of a single part and of a multipart segment"""
+    return (get_capacity(fmt, get_udh_len(False, locking_shift,
+                                          single_shift, udh_extra)),
+            get_capacity(fmt, get_udh_len(True, locking_shift,
+                                          single_shift, udh_extra,
+                                          concat_bits)))
+
+
+def _count_segments(fmt, length, locking_shift=None, single_shift=None,
+                    udh_extra=0, concat_bits=8):
+    single, multi = _capacities(fmt, locking_shift, single_shift, udh_extra,
+                                concat_bits)
+    if length <= single:
+        return 1
+
+    return -(-length // multi)
+
+
+def _split(fmt, data, locking_shift=None, single_shift=None, udh_extra=0,
+           concat_bits=8, word_tolerance=0):
+    single, multi = _capacities(fmt, locking_shift, single_shift, udh_extra,
+                                concat_bits)
+    if fmt == 0x00:
+        return split_septets(data, single, multi, word_tolerance)
+
+    # 8 bit text is latin-1, one code unit per character
+    return split_text(data, single, multi, word_tolerance)
+
+
+class TextInfo:
+    """
+    I am the outcome of :func:`classify`
+
+    ``septets`` and ``segments_7bit`` are None unless ``is_gsm``, in which
+    case ``offending`` and ``offending_index`` are None
+    """
+    __slots__ = ('is_gsm', 'septets', 'offending', 'offending_index',
+                 'segments_7bit', 'segments_8bit', 'segments_ucs2')
+
+    def __init__(self, is_gsm, septets, offending, offending_index,
+                 segments_7bit, segments_8bit, segments_ucs2):
+        self.is_gsm = is_gsm
+        self.septets = septets
+        self.offending = offending
+        self.offending_index = offending_index
+        self.segments_7bit = segments_7bit
+        self.segments_8bit = segments_8bit
+        self.segments_ucs2 = segments_ucs2
+
+    def __repr__(self):
+        args = (self.is_gsm, self.septets, self.segments_7bit,
+                self.segments_8bit, self.segments_ucs2)
+        return ("<TextInfo is_gsm: %s septets: %s segments: %s/%d/%d>" %
+                args)
+
+
+def classify(text, charset=DEFAULT_CHARSET):
+    """
+    Returns a :class:`TextInfo` describing how ``text`` can be sent
+
+    GSM text is checked and measured with a single ``str.translate``
+    pass, escape sequences counting as two septets.
+
+    :param charset: the :class:`~messaging.sms.gsm0338.GSMCharset`
+                    to check ``text`` against
+    """
+    segments_8bit = _count_segments(0x04, len(text))
+    segments_ucs2 = _count_segments(0x08, utf16_len(text))
+    try:
+        septets = len(charset.encode(text))
+    except UnicodeError:
+        index = charset.find_unencodable(text)
+        return TextInfo(False, None, text[index], index, None,
+                        segments_8bit, segments_ucs2)
+
+    return TextInfo(True, septets, None, None,
+                    _count_segments(0x00, septets),
+                    segments_8bit, segments_ucs2)
+
+
+def _septets(counts, table):
+    """Returns the septets taken by ``counts`` or None if not encodable"""
+    total = 0
+    for char, count in counts.items():
+        gsm = table.get(ord(char))
+        if gsm is None:
+            return None
+
+        total += count * len(gsm)
+
+    return total
+
+
+def _shift_options(languages, locking_shift, single_shift):
+    if locking_shift or single_shift:
+        return [(locking_shift or 0, single_shift or 0)]
+
+    options = [(0, 0)]
+    for lang in languages:
+        if lang in SINGLE_SHIFT_CHARSETS:
+            options.append((0, lang))
+    for lang in languages:
+        if lang in LOCKING_SHIFT_CHARSETS:
+            options.append((lang, 0))
+            if lang in SINGLE_SHIFT_CHARSETS:
+                options.append((lang, lang))
+
+    return options
+
+
+def plan_encoding(text, fmt=None, languages=(), translit=None,
+                  locking_shift=None, single_shift=None, udh_extra=0,
+                  concat_bits=8, word_tolerance=0):
+    """
+    Returns the :class:`EncodingPlan` that sends ``text`` in the fewest
+    segments
+
+    The text is scanned once, the cost of every candidate is then worked
+    out from its character counts. On a tie the default alphabet wins
+    over the national shift tables, which win over transliterated text,
+    which wins over UCS2: the untransliterated text is only dropped
+    when that saves a segment, UCS2 as soon as ``translit`` is set.
+
+    Segments never end within an escape sequence, a surrogate pair or a
+    grapheme cluster, see :mod:`messaging.sms.segmentation`.
+
+    :param fmt: force 0x00 (7 bit), 0x04 (8 bit) or 0x08 (UCS2)
+    :param languages: national language identifiers whose shift tables
+                      may be used
+    :param translit: ``str.translate`` table applied to characters that
+                     do not fit in the GSM alphabet
+    :param locking_shift: force the national locking shift table
+    :param single_shift: force the national single shift table
+    :param udh_extra: octets taken by other IEs in every segment's UDH
+    :param concat_bits: 8 or 16, size of the concatenation reference
+    :param word_tolerance: septets/characters a segment may give up to
+                           end on a word boundary
+    :raise UnicodeError: if ``fmt`` is 0x00 and ``text`` is not encodable
+    """
+    if fmt in (0x04, 0x08):
+        return EncodingPlan(fmt, text, text,
+                            _split(fmt, text, udh_extra=udh_extra,
+                                   concat_bits=concat_bits,
+                                   word_tolerance=word_tolerance))
+    elif fmt not in (None, 0x00):
+        raise ValueError("Unknown data coding scheme: %d" % fmt)
+
+    options = _shift_options(languages, locking_shift, single_shift)
+    if len(options) == 1:
+        # a single 7 bit candidate, which never takes more segments than
+        # UCS2 (two septets per character at worst)
+        locking, single = options[0]
+        try:
+            data = get_charset(locking, single).encode(text)
+        except UnicodeError:
+            if fmt == 0x00 and translit is None:
+                raise
+        else:
+            return EncodingPlan(0x00, text, data,
+                                _split(0x00, data, locking, single,
+                                       udh_extra, concat_bits,
+                                       word_tolerance),
+                                locking or None, single or None)
+
+    counts = Counter(text)
+
+    # (segments, preference, locking, single, transliterated), the 7 bit
+    # candidates come first, then the transliterated ones and UCS2
+    ucs2 = len(options) * 2
+    candidates = []
+    for i, (locking, single) in enumerate(options):
+        table = get_charset(locking, single).encode_table
+        septets = _septets(counts, table)
+        if septets is not None:
+            candidates.append((_count_segments(0x00, septets, locking,
+                                               single, udh_extra,
+                                               concat_bits),
+                               i, locking, single, False))
+
+    if fmt is None:
+        candidates.append((_count_segments(0x08, utf16_len(text),
+                                           udh_extra=udh_extra,
+                                           concat_bits=concat_bits),
+                           ucs2, 0, 0, False))
+
+    if translit is not None:
+        translated = Counter()
+        for char, count in counts.items():
+            for sub in char.translate(translit):
+                translated[sub] += count
+
+        if translated != counts:
+            for i, (locking, single) in enumerate(options):
+                table = get_charset(locking, single).encode_table
+                septets = _septets(translated, table)
+                if septets is not None:
+                    candidates.append(
+                        (_count_segments(0x00, septets, locking, single,
+                                         udh_extra, concat_bits),
+                         len(options) + i, locking, single, True))
+
+    if not candidates:
+        # not encodable with fmt 0x00, let the codec raise
+        locking, single = options[0]
+        get_charset(locking, single).encode(text)
+
+    _, preference, locking, single, transliterated = min(candidates)
+    if preference == ucs2:
+        return EncodingPlan(0x08, text, text,
+                            _split(0x08, text, udh_extra=udh_extra,
+                                   concat_bits=concat_bits,
+                                   word_tolerance=word_tolerance))
+
+    if transliterated:
+        text = text.translate(translit)
+
+    data = get_charset(locking, single).encode(text)
+    return EncodingPlan(0x00, text, data,
+                        _split(0x00, data, locking, single, udh_extra,
+                               concat_bits, word_tolerance),
+                        locking or None, single or None, transliterated)
+
+
+class Estimate:
+    """
+    I am the outcome of :func:`estimate`
+
+    ``ranges`` holds the ``(start, end)`` character offsets of every
+    segment in the text and ``remaining`` the septets (7 bit), octets
+    (8 bit) or UTF-16 code units (UCS2) still free in the last segment.
+    """
+    __slots__ = ('fmt', 'segments', 'ranges', 'remaining')
+
+    def __init__(self, fmt, segments, ranges, remaining):
+        self.fmt = fmt
+        self.segments = segments
+        self.ranges = ranges
+        self.remaining = remaining
+
+    def __repr__(self):
+        args = (self.fmt, self.segments, self.remaining)
+        return "<Estimate fmt: %d segments: %d remaining: %d>" % args
+
+
+def _char_offset(data, septet):
+    """Returns how many characters start before ``septet`` in ``data``"""
+    return septet - data.count(b'\x1b', 0, septet)
+
+
+def estimate(text, fmt=None, udh_extra=0, concat_bits=8, word_tolerance=0):
+    """
+    Returns an :class:`Estimate` of the segments ``text`` will be sent in
+
+    The encoding and the segments are the ones
+    :class:`~messaging.sms.SmsSubmit` would use, but no PDU is built.
+
+    :param fmt: force 0x00 (7 bit), 0x04 (8 bit) or 0x08 (UCS2)
+    :param udh_extra: octets taken by other IEs in every segment's UDH
+    :param concat_bits: 8 or 16, size of the concatenation reference
+    :param word_tolerance: see :func:`plan_encoding`
+    """
+    plan = plan_encoding(text, fmt, udh_extra=udh_extra,
+                         concat_bits=concat_bits,
+                         word_tolerance=word_tolerance)
+    segments = plan.segments
+    if plan.fmt == 0x00 and len(plan.data) != len(text):
+        data = plan.data
+        ranges = [(_char_offset(data, start), _char_offset(data, end))
+                  for start, end in segments]
+    else:
+        ranges = list(segments)
+
+    single, multi = _capacities(plan.fmt, plan.locking_shift,
+                                plan.single_shift, udh_extra, concat_bits)
+    start, end = segments[-1]
+    used = end - start
+    if plan.fmt == 0x08:
+        used = utf16_len(text[start:end])
+
+    remaining = (single if len(segments) == 1 else multi) - used
+    return Estimate(plan.fmt, len(segments), ranges, remaining)
@@ -0,0 +1,114 @@
+# See LICENSE
+"""Allocation of TP-MR and concatenated message references"""
+
+from itertools import count
+import os
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # not on Windows
+    fcntl = None
+
+
+def _get_slot(dest, slots):
+    """Returns the counter of ``dest`` out of ``slots``"""
+    key = dest.encode('ascii') if dest is not None else b''
+    return zlib.crc32(key) % slots
+
+
+class RefAllocator:
+    """
+    I hand out references, one counter per destination
+
+    Every destination is hashed to one of ``slots`` counters, so that
+    my size does not grow with the number of destinations. A
+    destination never gets the same reference twice until its counter
+    wraps around, sooner if it shares it with others. Counters are
+    :func:`itertools.count` objects, advancing them is atomic so no lock
+    is needed to share me between threads.
+
+    :param bits: 8, or 16 for 16 bit concatenation references (IEI 0x08)
+    :param start: first reference of every destination
+    """
+
+    def __init__(self, bits=8, start=0, slots=4096):
+        if bits not in (8, 16):
+            raise ValueError("Invalid reference size: %d bits" % bits)
+
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.start = start
+        self.slots = slots
+        self._counters = [count(start) for _ in range(slots)]
+
+    def allocate(self, dest=None):
+        """
+        Returns the next reference for ``dest``
+
+        :param dest: destination number, None shares a counter between
+                     all the messages with no single destination
+        """
+        return next(self._counters[_get_slot(dest, self.slots)]) & self.mask
+
+
+class FileRefAllocator:
+    """
+    I hand out references from counters stored in a file
+
+    Several processes opening the same ``path`` never get the same
+    reference for a destination until the counter wraps around. Every
+    destination is hashed to one of ``slots`` 16 bit counters, each one
+    locked on its own with :func:`fcntl.lockf`.
+    """
+
+    def __init__(self, path, bits=8, slots=4096):
+        if fcntl is None:
+            raise OSError("fcntl is not available")
+
+        if bits not in (8, 16):
+            raise ValueError("Invalid reference size: %d bits" % bits)
+
+        self.path = path
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        size = slots * 2
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def allocate(self, dest=None):
+        """Returns the next reference for ``dest``"""
+        offset = _get_slot(dest, self.slots) * 2
+
+        # lockf locks belong to the process, the threads of which are
+        # serialised by _lock
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 2, offset)
+            try:
+                ref = int.from_bytes(os.pread(self._fd, 2, offset), 'big')
+                os.pwrite(self._fd, ((ref + 1) & 0xFFFF).to_bytes(2, 'big'),
+                          offset)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 2, offset)
+
+        return ref & self.mask
+
+
+# shared by every SmsSubmit unless told otherwise
+TPMR_ALLOCATOR = RefAllocator()
+CONCAT_ALLOCATOR = RefAllocator()
+CONCAT16_ALLOCATOR = RefAllocator(16)
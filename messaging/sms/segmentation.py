@@ -0,0 +1,156 @@
+# See LICENSE
+"""Split of the user data of a message into segments"""
+
+import unicodedata
+
+ESC = 0x1B
+ZWJ = '\u200d'
+
+# septets a 7 bit segment may end on when looking for a word boundary
+_GSM_SPACES = (0x20, 0x0A, 0x0D)
+
+
+def utf16_len(text):
+    """Returns the UTF-16 code units taken by ``text``"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _is_extender(char):
+    """Whether ``char`` belongs to the grapheme cluster before it"""
+    if unicodedata.category(char) in ('Mn', 'Mc', 'Me'):
+        # combining marks, variation selectors included
+        return True
+
+    cp = ord(char)
+    # ZWJ, emoji modifiers and tags
+    return (char == ZWJ or 0x1F3FB <= cp <= 0x1F3FF or
+            0xE0020 <= cp <= 0xE007F)
+
+
+def _is_regional_indicator(char):
+    return '\U0001F1E6' <= char <= '\U0001F1FF'
+
+
+def is_grapheme_boundary(text, i):
+    """
+    Whether a segment of ``text`` may end before ``text[i]``
+
+    A subset of the extended grapheme cluster rules of UAX #29: CR LF,
+    combining marks, ZWJ sequences, emoji modifiers, tag sequences and
+    flags (regional indicator pairs) are kept together.
+    """
+    if i <= 0 or i >= len(text):
+        return True
+
+    prev, char = text[i - 1], text[i]
+    if prev == '\r' and char == '\n':
+        return False
+    if prev == ZWJ or _is_extender(char):
+        return False
+    if _is_regional_indicator(prev) and _is_regional_indicator(char):
+        # flags are pairs, break after an even number of indicators
+        start = i - 1
+        while start > 0 and _is_regional_indicator(text[start - 1]):
+            start -= 1
+        return (i - start) % 2 == 0
+
+    return True
+
+
+def split_septets(data, single, multi, word_tolerance=0):
+    """
+    Returns the ``(start, end)`` offsets of the segments of GSM ``data``
+
+    An escape sequence is never split between two segments.
+
+    :param data: GSM characters, one septet per ``bytes`` item
+    :param single: capacity of a message sent in one segment
+    :param multi: capacity of every segment of a concatenated message
+    :param word_tolerance: how many septets a segment may give up to end
+                           after a space or a line break
+    """
+    length = len(data)
+    if length <= single:
+        return [(0, length)]
+
+    segments = []
+    start = 0
+    while start < length:
+        end = start + multi
+        if end >= length:
+            end = length
+        else:
+            if data[end - 1] == ESC:
+                end -= 1
+
+            if word_tolerance:
+                lowest = max(start, end - word_tolerance - 2)
+                for i in range(end - 1, lowest, -1):
+                    # mind the escape sequences (0x0A is a form feed)
+                    if data[i] in _GSM_SPACES and data[i - 1] != ESC:
+                        end = i + 1
+                        break
+
+        segments.append((start, end))
+        start = end
+
+    return segments
+
+
+def _is_word_boundary(text, i):
+    return text[i - 1].isspace() and is_grapheme_boundary(text, i)
+
+
+def split_text(text, single, multi, word_tolerance=0):
+    """
+    Returns the ``(start, end)`` offsets of the segments of ``text``
+
+    The capacities are UTF-16 code units, so the characters outside the
+    BMP take two of them. Surrogate pairs and grapheme clusters are never
+    split between two segments, unless a cluster does not fit in one.
+
+    :param single: capacity of a message sent in one segment
+    :param multi: capacity of every segment of a concatenated message
+    :param word_tolerance: how many code units a segment may give up to
+                           end after a whitespace
+    """
+    length = len(text)
+    units = utf16_len(text)
+    if units <= single:
+        return [(0, length)]
+
+    bmp = units == length
+    segments = []
+    start = 0
+    while start < length:
+        if bmp:
+            end = min(start + multi, length)
+        else:
+            end = start
+            units = 0
+            while end < length:
+                units += 2 if text[end] > '\uffff' else 1
+                if units > multi:
+                    break
+                end += 1
+
+        if end < length:
+            boundary = end
+            while boundary > start and not is_grapheme_boundary(text,
+                                                                boundary):
+                boundary -= 1
+            if boundary > start:
+                end = boundary
+
+            if word_tolerance:
+                # a close enough approximation for astral characters
+                lowest = max(start, end - word_tolerance - 1)
+                for i in range(end, lowest, -1):
+                    if _is_word_boundary(text, i):
+                        end = i
+                        break
+
+        segments.append((start, end))
+        start = end
+
+    return segments
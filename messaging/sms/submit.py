@@ -2,22 +2,234 @@
 """Classes for sending SMS"""
 
 from datetime import datetime, timedelta
+from functools import lru_cache
 import re
-import logging
+from time import perf_counter
 
-from messaging.sms import consts
-from messaging.utils import (encode_str, clean_number,
-                             pack_8bits_to_ucs2, pack_8bits_to_7bits,
-                             pack_8bits_to_8bit,
+import messaging
+from messaging.utils import (NIBBLE_SWAP, encode_bytes, clean_number,
+                             pack_ud_7bit, pack_ud_8bit, pack_ud_ucs2,
                              timedelta_to_relative_validity,
                              datetime_to_absolute_validity)
 from messaging.sms.base import SmsBase
-from messaging.sms.gsm0338 import is_valid_gsm
-from messaging.sms.pdu import Pdu
+from messaging.sms.pdu import Pdu, SmppSegment
+from messaging.sms.planner import plan_encoding
+from messaging.sms.refs import (CONCAT_ALLOCATOR, CONCAT16_ALLOCATOR,
+                                TPMR_ALLOCATOR)
+from messaging.sms.udh import ConcatReference
 
 VALID_NUMBER = re.compile(r"^\+?\d{3,20}$")
 
 
+# most of the traffic goes to a few numbers through a single SMSC
+@lru_cache(maxsize=4096)
+def _encode_address(number):
+    """Returns the TP-DA of ``number``"""
+    number = clean_number(number)
+    ptype = 0x81
+    if number[0] == '+':
+        number = number[1:]
+        ptype = 0x91
+
+    pl = len(number)
+    if len(number) % 2:
+        number += 'F'
+
+    return bytes((pl, ptype)) + bytes.fromhex(number).translate(NIBBLE_SWAP)
+
+
+@lru_cache(maxsize=16)
+def _encode_smsc(csca):
+    """Returns the SMSC address of ``csca``"""
+    if not csca or not csca.strip():
+        return b"\x00"
+
+    number = clean_number(csca)
+    ptype = 0x81  # set to unknown number by default
+    if number[0] == '+':
+        number = number[1:]
+        ptype = 0x91
+
+    if len(number) % 2:
+        number += 'F'
+
+    ps = bytes((ptype,)) + bytes.fromhex(number).translate(NIBBLE_SWAP)
+    return bytes((len(ps),)) + ps
+
+
+def _get_sms_submit_pdu(validity, request_status, udh):
+    sms_submit = 0x1
+    if validity is None:
+        # handle no validity
+        pass
+    elif isinstance(validity, datetime):
+        # handle absolute validity
+        sms_submit |= 0x18
+    elif isinstance(validity, timedelta):
+        # handle relative validity
+        sms_submit |= 0x10
+
+    if request_status:
+        sms_submit |= 0x20
+
+    if udh:
+        sms_submit |= 0x40
+
+    return bytes((sms_submit,))
+
+
+def _get_dcs(fmt, klass):
+    dcs = fmt
+    if klass is not None:
+        if klass == 0:
+            dcs |= 0x10
+        elif klass == 1:
+            dcs |= 0x11
+        elif klass == 2:
+            dcs |= 0x12
+        elif klass == 3:
+            dcs |= 0x13
+
+    return dcs
+
+
+def _get_msgvp_pdu(validity):
+    # Validity period
+    msgvp_pdu = b""
+    if validity is None:
+        # handle no validity
+        pass
+
+    elif isinstance(validity, timedelta):
+        # handle relative
+        msgvp = timedelta_to_relative_validity(validity)
+        msgvp_pdu = bytes((msgvp,))
+
+    elif isinstance(validity, datetime):
+        # handle absolute
+        msgvp = datetime_to_absolute_validity(validity)
+        msgvp_pdu = bytes(msgvp)
+
+    return msgvp_pdu
+
+
+def _check_klass(klass):
+    if not isinstance(klass, int):
+        raise TypeError("_set_klass only accepts int objects")
+
+    if klass not in [0, 1, 2, 3]:
+        raise ValueError("class must be between 0 and 3")
+
+
+def _check_validity(validity):
+    # valid values are None, timedelta and datetime
+    if not (validity is None or isinstance(validity, (timedelta, datetime))):
+        raise TypeError("Don't know what to do with %s" % validity)
+
+
+def _validity_key(validity):
+    """Tells apart the same instant in two time zones"""
+    if isinstance(validity, datetime):
+        return validity, validity.utcoffset()
+
+    return validity, None
+
+
+class SubmitProfile:
+    """
+    I am the header fields shared by many :class:`SmsSubmit`
+
+    The SMSC address, the first octet with and without UDHI, the PID,
+    the DCS of every data coding and the validity period are encoded
+    when set rather than for every message. Set me as
+    :attr:`SmsSubmit.profile`, I then take precedence over its
+    ``csca``, ``validity``, ``klass``, ``pid`` and ``request_status``.
+    """
+
+    def __init__(self, csca=None, validity=None, klass=None, pid=0x00,
+                 request_status=False):
+        self._csca = None
+        self._validity = None
+        self._validity_key = (None, None)
+        self._klass = None
+        self._pid = 0x00
+        self._request_status = False
+        self.smsc_pdu = b"\x00"
+        self.msgvp_pdu = b""
+        self.tppid_pdu = b"\x00"
+        self.dcs = {0x00: 0x00, 0x04: 0x04, 0x08: 0x08}
+        self.sms_submit_pdu = {}
+        self._update_sms_submit_pdu()
+
+        self.csca = csca
+        self.validity = validity
+        self.klass = klass
+        self.pid = pid
+        self.request_status = request_status
+
+    def _update_sms_submit_pdu(self):
+        self.sms_submit_pdu = {
+            udh: _get_sms_submit_pdu(self._validity, self._request_status,
+                                     udh)
+            for udh in (False, True)
+        }
+
+    def _set_csca(self, csca):
+        if csca and not VALID_NUMBER.match(csca):
+            raise ValueError("Invalid csca format: %s" % csca)
+
+        self._csca = csca
+        self.smsc_pdu = _encode_smsc(csca)
+
+    csca = property(lambda self: self._csca, _set_csca)
+
+    def _set_validity(self, validity):
+        _check_validity(validity)
+        key = _validity_key(validity)
+        if key == self._validity_key:
+            # absolute validity periods are costly to encode
+            return
+
+        self.msgvp_pdu = _get_msgvp_pdu(validity)
+        self._validity = validity
+        self._validity_key = key
+        self._update_sms_submit_pdu()
+
+    validity = property(lambda self: self._validity, _set_validity)
+
+    def _set_klass(self, klass):
+        if klass is not None:
+            _check_klass(klass)
+
+        self._klass = klass
+        self.dcs = {fmt: _get_dcs(fmt, klass) for fmt in (0x00, 0x04, 0x08)}
+
+    klass = property(lambda self: self._klass, _set_klass)
+
+    def _set_pid(self, pid):
+        self.tppid_pdu = bytes((pid,))
+        self._pid = pid
+
+    pid = property(lambda self: self._pid, _set_pid)
+
+    def _set_request_status(self, request_status):
+        self._request_status = request_status
+        self._update_sms_submit_pdu()
+
+    request_status = property(lambda self: self._request_status,
+                              _set_request_status)
+
+
+def _set_options(sms, options):
+    """Sets the ``options`` dict as attributes of ``sms``"""
+    if options:
+        for name, value in options.items():
+            if not hasattr(sms, name):
+                raise TypeError("Unknown SmsSubmit option: %s" % name)
+
+            setattr(sms, name, value)
+
+
 class SmsSubmit(SmsBase):
     """I am a SMS ready to be sent"""
 
@@ -30,13 +242,37 @@ class SmsSubmit(SmsBase):
         self.request_status = False
         self.ref = None
         self.rand_id = None
-        self.id_list = range(0, 255)
+        # 8 or 16, size of the concatenation reference (IEI 0x00 or 0x08)
+        self.concat_bits = 8
+        # septets/characters a segment may give up to end on a word
+        self.word_tolerance = 0
+        # allocators of ref and rand_id when they are not set, None picks
+        # the shared one matching concat_bits
+        self.ref_allocator = TPMR_ALLOCATOR
+        self.concat_allocator = None
+        # EncodeCache sharing the user data of identical bodies, if any
+        self.cache = None
+        # SubmitProfile overriding csca, validity, klass, pid and
+        # request_status, if any
+        self.profile = None
         self.msgvp = 0xaa
         self.pid = 0x00
 
         self.number = number
         self.text = text
         self.text_gsm = None
+        # national language identifiers of the shift tables (7 bit only)
+        self.locking_shift = None
+        self.single_shift = None
+        # national languages the shift tables can be picked from when
+        # neither fmt nor the shift tables are set
+        self.languages = ()
+        # TranslitTable used rather than UCS2, or when transliterating
+        # saves segments, e.g. messaging.sms.translit.DEFAULT_TABLE, and
+        # the characters it replaced in the last PDUs built
+        self.translit = None
+        self.substitutions = 0
+        self.plan = None
 
     def _set_number(self, number):
         if number and not VALID_NUMBER.match(number):
@@ -55,279 +291,324 @@ class SmsSubmit(SmsBase):
     csca = property(lambda self: self._csca, _set_csca)
 
     def _set_validity(self, validity):
-        if validity is None or isinstance(validity, (timedelta, datetime)):
-            # valid values are None, timedelta and datetime
-            self._validity = validity
-        else:
-            raise TypeError("Don't know what to do with %s" % validity)
+        _check_validity(validity)
+        self._validity = validity
 
     validity = property(lambda self: self._validity, _set_validity)
 
     def _set_klass(self, klass):
-        if not isinstance(klass, int):
-            raise TypeError("_set_klass only accepts int objects")
-
-        if klass not in [0, 1, 2, 3]:
-            raise ValueError("class must be between 0 and 3")
-
+        _check_klass(klass)
         self._klass = klass
 
     klass = property(lambda self: self._klass, _set_klass)
 
-    def to_pdu(self):
-        """Returns a list of :class:`~messaging.pdu.Pdu` objects"""
+    def to_pdu(self, binary=False):
+        """
+        Returns a list of :class:`~messaging.pdu.Pdu` objects
+
+        :param binary: return the PDUs as ``bytes`` instead, SMSC address
+                       included as ``AT+CMGS`` expects it, see
+                       :meth:`to_tpdus` for the bare TPDUs
+        """
+        tracer = messaging.tracer
+        if tracer is not None:
+            start = perf_counter()
+
         smsc_pdu = self._get_smsc_pdu()
-        sms_submit_pdu = self._get_sms_submit_pdu()
         tpmessref_pdu = self._get_tpmessref_pdu()
         sms_phone_pdu = self._get_phone_pdu()
         tppid_pdu = self._get_tppid_pdu()
-        sms_msg_pdu = self._get_msg_pdu()
-
-        if len(sms_msg_pdu) == 1:
-            pdu = smsc_pdu
-            len_smsc = len(smsc_pdu) / 2
-            pdu += sms_submit_pdu
-            pdu += tpmessref_pdu
-            pdu += sms_phone_pdu
-            pdu += tppid_pdu
-            pdu += sms_msg_pdu[0]
-            logging.debug("smsc_pdu: %s" % smsc_pdu)
-            logging.debug("sms_submit_pdu: %s" % sms_submit_pdu)
-            logging.debug("tpmessref_pdu: %s" % tpmessref_pdu)
-            logging.debug("sms_phone_pdu: %s" % sms_phone_pdu)
-            logging.debug("tppid_pdu: %s" % tppid_pdu)
-            logging.debug("sms_msg_pdu: %s" % sms_msg_pdu)
-            logging.debug("-" * 20)
-            logging.debug("full_pdu: %s" % pdu)
-            logging.debug("full_text: %s" % self.text)
-            logging.debug("-" * 20)
-            return [Pdu(pdu, len_smsc)]
+        sms_msg_pdu = self._get_msg_pdu(self.number)
+        cnt = len(sms_msg_pdu)
+        sms_submit_pdu = self._get_sms_submit_pdu(
+            udh=cnt > 1 or self.plan.get_udh() is not None)
+
+        head = smsc_pdu + sms_submit_pdu + tpmessref_pdu + sms_phone_pdu
+        head += tppid_pdu
+        if tracer is not None:
+            size = len(head) - len(smsc_pdu)
+            for i, sms_msg_pdu_item in enumerate(sms_msg_pdu):
+                tracer('sms.submit.segment', seq=i + 1, cnt=cnt,
+                       size=size + len(sms_msg_pdu_item))
+            tracer('sms.submit', fmt=self.fmt, dcs=self.dcs,
+                   length=len(self.text), segments=cnt,
+                   elapsed=perf_counter() - start)
+
+        if binary:
+            return [head + sms_msg_pdu_item
+                    for sms_msg_pdu_item in sms_msg_pdu]
+
+        len_smsc = len(smsc_pdu)
+        if cnt == 1:
+            return [Pdu(encode_bytes(head + sms_msg_pdu[0]), len_smsc)]
 
         # multipart SMS
-        sms_submit_pdu = self._get_sms_submit_pdu(udh=True)
         pdu_list = []
-        cnt = len(sms_msg_pdu)
         for i, sms_msg_pdu_item in enumerate(sms_msg_pdu):
-            pdu = smsc_pdu
-            len_smsc = len(smsc_pdu) / 2
-            pdu += sms_submit_pdu
-            pdu += tpmessref_pdu
-            pdu += sms_phone_pdu
-            pdu += tppid_pdu
-            pdu += sms_msg_pdu_item
-            logging.debug("smsc_pdu: %s" % smsc_pdu)
-            logging.debug("sms_submit_pdu: %s" % sms_submit_pdu)
-            logging.debug("tpmessref_pdu: %s" % tpmessref_pdu)
-            logging.debug("sms_phone_pdu: %s" % sms_phone_pdu)
-            logging.debug("tppid_pdu: %s" % tppid_pdu)
-            logging.debug("sms_msg_pdu: %s" % sms_msg_pdu_item)
-            logging.debug("-" * 20)
-            logging.debug("full_pdu: %s" % pdu)
-            logging.debug("full_text: %s" % self.text)
-            logging.debug("-" * 20)
-
+            pdu = encode_bytes(head + sms_msg_pdu_item)
             pdu_list.append(Pdu(pdu, len_smsc, cnt=cnt, seq=i + 1))
 
         return pdu_list
 
-    def _get_smsc_pdu(self):
-        if not self.csca or not self.csca.strip():
-            return "00"
+    def to_tpdus(self):
+        """
+        Returns the TPDU of every segment as ``bytes``
+
+        They are the PDUs of :meth:`to_pdu` without the SMSC address, as
+        SMPP and HTTP gateways take them
+        """
+        len_smsc = len(self._get_smsc_pdu())
+        return [pdu[len_smsc:] for pdu in self.to_pdu(binary=True)]
+
+    def to_pdu_many(self, numbers, binary=False):
+        """
+        Returns the list of PDUs of this message for every number
+
+        The user data is encoded once, only the destination address,
+        the TP-MR and the concatenation reference change from one number
+        to the next. TP-MR starts at :attr:`ref` and is increased for
+        every number, or is taken from :attr:`ref_allocator` if
+        :attr:`ref` is None. The concatenation reference of every number
+        is allocated as :meth:`to_pdu` does, unless :attr:`rand_id` is
+        set.
+
+        :param numbers: iterable of destination numbers, :attr:`number`
+                        is ignored
+        :param binary: return the PDUs as ``bytes``, see :meth:`to_pdu`
+        """
+        smsc_pdu = self._get_smsc_pdu()
+        tppid_pdu = self._get_tppid_pdu()
+        sms_msg_pdu = self._get_shared_msg_pdu()
+        cnt = len(sms_msg_pdu)
+        sms_submit_pdu = self._get_sms_submit_pdu(
+            udh=cnt > 1 or self.plan.get_udh() is not None)
+
+        prefix = smsc_pdu + sms_submit_pdu
+        tails = [tppid_pdu + item for item in sms_msg_pdu]
+        if cnt > 1:
+            # what comes before and after the concatenation reference
+            start = len(tppid_pdu) + self._get_concat_ref_offset()
+            end = start + self.concat_bits // 8
+            parts = [(tail[:start], tail[end:]) for tail in tails]
+            if not binary:
+                parts = [(encode_bytes(before), encode_bytes(after))
+                         for before, after in parts]
+        elif not binary:
+            tails = [encode_bytes(tails[0])]
+        len_smsc = len(smsc_pdu)
 
-        number = clean_number(self.csca)
-        ptype = 0x81  # set to unknown number by default
-        if number[0] == '+':
-            number = number[1:]
-            ptype = 0x91
+        ret = []
+        ref = self.ref
+        for number in numbers:
+            if not VALID_NUMBER.match(number):
+                raise ValueError("Invalid number format: %s" % number)
+
+            if self.ref is None:
+                ref = self.ref_allocator.allocate(number)
+
+            head = prefix + bytes((ref & 0xFF,)) + _encode_address(number)
+            ref += 1
+            if cnt > 1:
+                concat_ref_pdu = self._get_concat_ref_pdu(number)
+                if not binary:
+                    concat_ref_pdu = encode_bytes(concat_ref_pdu)
+                tails = [before + concat_ref_pdu + after
+                         for before, after in parts]
+
+            if binary:
+                ret.append([head + tail for tail in tails])
+                continue
+
+            head = encode_bytes(head)
+            if cnt == 1:
+                ret.append([Pdu(head + tails[0], len_smsc)])
+            else:
+                ret.append([Pdu(head + tail, len_smsc, cnt=cnt, seq=i + 1)
+                            for i, tail in enumerate(tails)])
 
-        if len(number) % 2:
-            number += 'F'
+        return ret
 
-        ps = chr(ptype)
-        for n in range(0, len(number), 2):
-            num = number[n + 1] + number[n]
-            ps += chr(int(num, 16))
+    def to_smpp(self, packed=False):
+        """
+        Returns a list of :class:`~messaging.pdu.SmppSegment` objects
+
+        They hold the ``data_coding``, ``esm_class`` and ``short_message``
+        (UDH + UD) of the SMPP ``submit_sm`` of every segment
+
+        :param packed: pack 7 bit text into septets. By default it is
+                       sent one GSM character per octet, as most SMSCs
+                       expect
+        """
+        self._set_plan()
+        segments = []
+        for udh, data in self._get_segments(self.number):
+            esm_class = 0x40 if udh else 0x00
+            if self.fmt == 0x00:
+                if packed:
+                    # the TP-UD, without TP-UDL
+                    short_message = pack_ud_7bit(data, udh)[1:]
+                else:
+                    short_message = udh + data
+            elif self.fmt == 0x04:
+                short_message = udh + data.encode('latin-1')
+            else:
+                short_message = udh + data.encode('utf-16-be')
 
-        pl = len(ps)
-        ps = chr(pl) + ps
+            segments.append(SmppSegment(self.dcs, esm_class, short_message))
 
-        return encode_str(ps)
+        return segments
+
+    def _get_smsc_pdu(self):
+        if self.profile is not None:
+            return self.profile.smsc_pdu
+
+        return _encode_smsc(self.csca)
 
     def _get_tpmessref_pdu(self):
         if self.ref is None:
-            self.ref = self._get_rand_id()
+            self.ref = self.ref_allocator.allocate(self.number)
 
         self.ref &= 0xFF
-        return encode_str(chr(self.ref))
+        return bytes((self.ref,))
 
     def _get_phone_pdu(self):
-        number = clean_number(self.number)
-        ptype = 0x81
-        if number[0] == '+':
-            number = number[1:]
-            ptype = 0x91
-
-        pl = len(number)
-        if len(number) % 2:
-            number += 'F'
-
-        ps = chr(ptype)
-        for n in range(0, len(number), 2):
-            num = number[n + 1] + number[n]
-            ps += chr(int(num, 16))
-
-        ps = chr(pl) + ps
-        return encode_str(ps)
+        return _encode_address(self.number)
 
     def _get_tppid_pdu(self):
-        return encode_str(chr(self.pid))
+        if self.profile is not None:
+            return self.profile.tppid_pdu
+
+        return bytes((self.pid,))
 
     def _get_sms_submit_pdu(self, udh=False):
-        sms_submit = 0x1
-        if self.validity is None:
-            # handle no validity
-            pass
-        elif isinstance(self.validity, datetime):
-            # handle absolute validity
-            sms_submit |= 0x18
-        elif isinstance(self.validity, timedelta):
-            # handle relative validity
-            sms_submit |= 0x10
-
-        if self.request_status:
-            sms_submit |= 0x20
-
-        if udh:
-            sms_submit |= 0x40
-
-        return encode_str(chr(sms_submit))
-
-    def _get_msg_pdu(self):
-        # Data coding scheme
-        if self.fmt is None:
-            if is_valid_gsm(self.text):
-                self.fmt = 0x00
-            else:
-                self.fmt = 0x08
+        if self.profile is not None:
+            return self.profile.sms_submit_pdu[udh]
 
-        self.dcs = self.fmt
+        return _get_sms_submit_pdu(self.validity, self.request_status, udh)
 
-        if self.klass is not None:
-            if self.klass == 0:
-                self.dcs |= 0x10
-            elif self.klass == 1:
-                self.dcs |= 0x11
-            elif self.klass == 2:
-                self.dcs |= 0x12
-            elif self.klass == 3:
-                self.dcs |= 0x13
+    def _set_plan(self):
+        plan = self.plan = plan_encoding(self.text, self.fmt, self.languages,
+                                         self.translit, self.locking_shift,
+                                         self.single_shift,
+                                         concat_bits=self.concat_bits,
+                                         word_tolerance=self.word_tolerance)
+        self.substitutions = 0
+        if plan.transliterated:
+            self.substitutions = self.translit.substitutions(self.text)
 
-        dcs_pdu = encode_str(chr(self.dcs))
+        # Data coding scheme
+        self.fmt = plan.fmt
+        if self.profile is None:
+            self.dcs = _get_dcs(self.fmt, self.klass)
+        else:
+            self.dcs = self.profile.dcs[self.fmt]
 
-        # Validity period
-        msgvp_pdu = ""
-        if self.validity is None:
-            # handle no validity
-            pass
+        if self.fmt == 0x00:
+            self.text_gsm = plan.data
+
+    def _get_msg_pdu(self, dest):
+        if self.cache is None:
+            return self._encode_msg_pdu(dest)
+
+        msg_pdus = self._get_shared_msg_pdu()
+        if len(msg_pdus) == 1:
+            return msg_pdus
+
+        start = self._get_concat_ref_offset()
+        ref = self._get_concat_ref_pdu(dest)
+        end = start + len(ref)
+        return [msg_pdu[:start] + ref + msg_pdu[end:] for msg_pdu in msg_pdus]
+
+    def _get_shared_msg_pdu(self):
+        """
+        Returns the user data of every segment, with a concatenation
+        reference of 0 that is patched for every destination
+        """
+        if self.cache is None:
+            return self._encode_msg_pdu(None, 0)
+
+        translit = id(self.translit) if self.translit is not None else None
+        profile = self.profile or self
+        key = (self.text, self.fmt, profile.klass,
+               _validity_key(profile.validity),
+               tuple(self.languages), translit, self.locking_shift,
+               self.single_shift, self.concat_bits, self.word_tolerance)
+        entry = self.cache.get(key)
+        if entry is None:
+            msg_pdus = self._encode_msg_pdu(None, 0)
+            self.cache.put(key, (self.plan, self.dcs, self.substitutions,
+                                 msg_pdus))
+        else:
+            self.plan, self.dcs, self.substitutions, msg_pdus = entry
+            self.fmt = self.plan.fmt
+            if self.fmt == 0x00:
+                self.text_gsm = self.plan.data
 
-        elif isinstance(self.validity, timedelta):
-            # handle relative
-            msgvp = timedelta_to_relative_validity(self.validity)
-            msgvp_pdu = encode_str(chr(msgvp))
+        return list(msg_pdus)
 
-        elif isinstance(self.validity, datetime):
-            # handle absolute
-            msgvp = datetime_to_absolute_validity(self.validity)
-            msgvp_pdu = ''.join(map(encode_str, map(chr, msgvp)))
+    def _get_concat_ref_offset(self):
+        # the concatenation IE comes first in the UDH, its reference after
+        # TP-DCS, TP-VP, TP-UDL, UDHL, IEI and IEDL
+        return 5 + len(self._get_msgvp_pdu())
 
-        # UDL + UD
-        message_pdu = ""
+    def _get_concat_ref_pdu(self, dest):
+        return self._get_concat_ref(dest).to_bytes(self.concat_bits // 8,
+                                                   'big')
 
-        if self.fmt == 0x00:
-            self.text_gsm = self.text.encode("gsm0338")
-            if len(self.text_gsm) <= consts.SEVENBIT_SIZE:
-                message_pdu = [pack_8bits_to_7bits(self.text_gsm)]
-            else:
-                message_pdu = self._split_sms_message(self.text_gsm)
-        elif self.fmt == 0x04:
-            if len(self.text) <= consts.EIGHTBIT_SIZE:
-                message_pdu = [pack_8bits_to_8bit(self.text)]
-            else:
-                message_pdu = self._split_sms_message(self.text)
-        elif self.fmt == 0x08:
-            if len(self.text) <= consts.UCS2_SIZE:
-                message_pdu = [pack_8bits_to_ucs2(self.text)]
-            else:
-                message_pdu = self._split_sms_message(self.text)
-        else:
-            raise ValueError("Unknown data coding scheme: %d" % self.fmt)
+    def _encode_msg_pdu(self, dest, sms_ref=None):
+        self._set_plan()
+        dcs_pdu = bytes((self.dcs,))
+        msgvp_pdu = self._get_msgvp_pdu()
 
         ret = []
-        for msg in message_pdu:
-            ret.append(dcs_pdu + msgvp_pdu + msg)
+        for udh, data in self._get_segments(dest, sms_ref):
+            ret.append(dcs_pdu + msgvp_pdu + self._pack(data, udh))
 
         return ret
 
-    def _split_sms_message(self, text):
-        if self.fmt == 0x00:
-            len_without_udh = consts.SEVENBIT_MP_SIZE
-            limit = consts.SEVENBIT_SIZE
-            packing_func = pack_8bits_to_7bits
-            total_len = len(self.text_gsm)
+    def _get_msgvp_pdu(self):
+        if self.profile is not None:
+            return self.profile.msgvp_pdu
 
-        elif self.fmt == 0x04:
-            len_without_udh = consts.EIGHTBIT_MP_SIZE
-            limit = consts.EIGHTBIT_SIZE
-            packing_func = pack_8bits_to_8bit
-            total_len = len(self.text)
-
-        elif self.fmt == 0x08:
-            len_without_udh = consts.UCS2_MP_SIZE
-            limit = consts.UCS2_SIZE
-            packing_func = pack_8bits_to_ucs2
-            total_len = len(self.text)
-
-        msgs = []
-        pi, pe = 0, len_without_udh
-
-        while pi < total_len:
-            if text[pi:pe][-1] == '\x1b':
-                pe -= 1
-
-            msgs.append(text[pi:pe])
-            pi = pe
-            pe += len_without_udh
-
-        pdu_msgs = []
-
-        udh_len = 0x05
-        mid = 0x00
-        data_len = 0x03
-
-        sms_ref = self._get_rand_id() if self.rand_id is None else self.rand_id
-        sms_ref &= 0xFF
-
-        for i, msg in enumerate(msgs):
-            if isinstance(msg, bytes):
-                msg = msg.decode()
-            i += 1
-            total_parts = len(msgs)
-            if limit == consts.SEVENBIT_SIZE:
-                udh = (chr(udh_len) + chr(mid) + chr(data_len) +
-                       chr(sms_ref) + chr(total_parts) + chr(i))
-                padding = " "
-            else:
-                udh = (chr(int("%04x" % ((udh_len << 8) | mid), 16)) +
-                       chr(int("%04x" % ((data_len << 8) | sms_ref), 16)) +
-                       chr(int("%04x" % ((total_parts << 8) | i), 16)))
-                padding = ""
-
-            pdu_msgs.append(packing_func(padding + msg, udh))
-
-        return pdu_msgs
+        return _get_msgvp_pdu(self.validity)
 
-    def _get_rand_id(self):
-        if not self.id_list:
-            self.id_list = range(0, 255)
-
-        return list(self.id_list).pop(0)
+    def _pack(self, data, udh):
+        if self.fmt == 0x00:
+            return pack_ud_7bit(data, udh)
+        elif self.fmt == 0x04:
+            return pack_ud_8bit(data.encode('latin-1'), udh)
+
+        return pack_ud_ucs2(data, udh)
+
+    def _get_concat_ref(self, dest):
+        eight_bits = self.concat_bits == 8
+        sms_ref = self.rand_id
+        if sms_ref is None:
+            allocator = self.concat_allocator
+            if allocator is None:
+                allocator = (CONCAT_ALLOCATOR if eight_bits
+                             else CONCAT16_ALLOCATOR)
+            sms_ref = allocator.allocate(dest)
+
+        return sms_ref & (0xFF if eight_bits else 0xFFFF)
+
+    def _get_segments(self, dest, sms_ref=None):
+        """Returns the UDH and data of every segment of :attr:`plan`"""
+        plan = self.plan
+        if len(plan.segments) == 1:
+            udh = plan.get_udh()
+            return [(udh.to_bytes() if udh is not None else b'', plan.data)]
+
+        if sms_ref is None:
+            sms_ref = self._get_concat_ref(dest)
+
+        concat = ConcatReference(sms_ref, len(plan.segments), 0,
+                                 self.concat_bits == 8)
+        udh = plan.get_udh(concat)
+
+        segments = []
+        for i, (start, end) in enumerate(plan.segments):
+            concat.seq = i + 1
+            segments.append((udh.to_bytes(), plan.data[start:end]))
+
+        return segments
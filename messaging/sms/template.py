@@ -0,0 +1,192 @@
+# See LICENSE
+"""Compiled templates for personalised single segment messages"""
+
+from string import Formatter
+
+from messaging.utils import encode_bytes, pack_septets
+from messaging.sms import consts
+from messaging.sms.gsm0338 import DEFAULT_CHARSET
+from messaging.sms.pdu import Pdu
+from messaging.sms.planner import get_capacity
+from messaging.sms.submit import (SmsSubmit, VALID_NUMBER, _encode_address,
+                                  _set_options)
+
+_FORMATTER = Formatter()
+
+# options that take the message off the precomputed encoding
+_PLANNING_OPTIONS = ('fmt', 'languages', 'translit', 'locking_shift',
+                     'single_shift')
+
+
+class SmsTemplate:
+    """
+    I am a message text with replacement fields, compiled for speed
+
+    ``template`` uses the :meth:`str.format` syntax. The encoding of the
+    literal text, its packed septets up to the first field and the header
+    fields are worked out once; :meth:`render` only encodes the fields,
+    the text after them and the destination. Messages that do not fit in
+    a single segment, or whose fields are not in the alphabet of the
+    literal text, are encoded in full by :class:`~messaging.sms.SmsSubmit`.
+
+    :param options: :class:`~messaging.sms.SmsSubmit` attributes to set
+                    (``csca``, ``validity``, ``klass``, ...)
+    """
+
+    def __init__(self, template, **options):
+        self.template = template
+        self.options = options
+        # (literal, field name, conversion, format spec) tuples
+        self._parts = (list(_FORMATTER.parse(template)) or
+                       [('', None, '', None)])
+
+        literals = ''.join(part[0] for part in self._parts)
+        sms = SmsSubmit(None, literals)
+        _set_options(sms, options)
+        sms._set_plan()
+
+        self.fmt = None
+        if not any(options.get(name) for name in _PLANNING_OPTIONS):
+            if sms.plan.fmt == 0x00 and not sms.plan.get_udh():
+                self.fmt = 0x00
+            elif sms.plan.fmt == 0x08:
+                self.fmt = 0x08
+
+        self._ref = options.get('ref')
+        self._ref_allocator = sms.ref_allocator
+        self._smsc_pdu = sms._get_smsc_pdu()
+        self._len_smsc = len(self._smsc_pdu)
+        self._sms_submit_pdu = sms._get_sms_submit_pdu()
+        self._dcs_pdu = (sms._get_tppid_pdu() + bytes((sms.dcs,)) +
+                         sms._get_msgvp_pdu())
+
+        if self.fmt == 0x00:
+            self._capacity = get_capacity(0x00)
+            prefix = DEFAULT_CHARSET.encode(self._parts[0][0])
+            self._prefix_len = len(prefix)
+            packed = pack_septets(prefix)
+            # the last octet is shared with the septets that follow
+            full, self._fill_bits = divmod(len(prefix) * 7, 8)
+            self._prefix = packed[:full]
+            self._partial = packed[full] if self._fill_bits else 0
+            # the other literals packed after 0 to 7 used bits
+            self._literals = []
+            for part in self._parts:
+                septets = DEFAULT_CHARSET.encode(part[0])
+                self._literals.append(
+                    (len(septets), [pack_septets(septets, fill_bits)
+                                    for fill_bits in range(8)]))
+        elif self.fmt == 0x08:
+            self._literals = [part[0].encode('utf-16-be')
+                              for part in self._parts]
+
+    def format(self, **values):
+        """Returns the text of the message for ``values``"""
+        return ''.join([part[0] + self._format(part, values)
+                        for part in self._parts])
+
+    def _format(self, part, values):
+        _, name, spec, conversion = part
+        if name is None:
+            return ''
+
+        if name.isidentifier():
+            value = values[name]
+        else:
+            value = _FORMATTER.get_field(name, (), values)[0]
+
+        if conversion:
+            value = _FORMATTER.convert_field(value, conversion)
+
+        return format(value, spec)
+
+    def render(self, number, binary=False, **values):
+        """
+        Returns the PDUs of the message for ``number`` and ``values``
+
+        The PDUs are the ones :meth:`~messaging.sms.SmsSubmit.to_pdu`
+        would return for the same text and options.
+
+        :param binary: return the PDUs as ``bytes``
+        """
+        user_data = None
+        if self.fmt == 0x00:
+            user_data = self._render_7bit(values)
+        elif self.fmt == 0x08:
+            user_data = self._render_ucs2(values)
+
+        if user_data is None:
+            sms = SmsSubmit(number, self.format(**values))
+            _set_options(sms, self.options)
+            return sms.to_pdu(binary=binary)
+
+        if not VALID_NUMBER.match(number):
+            raise ValueError("Invalid number format: %s" % number)
+
+        ref = self._ref
+        if ref is None:
+            ref = self._ref_allocator.allocate(number)
+
+        pdu = (self._smsc_pdu + self._sms_submit_pdu + bytes((ref & 0xFF,)) +
+               _encode_address(number) + self._dcs_pdu + user_data)
+        if binary:
+            return [pdu]
+
+        return [Pdu(encode_bytes(pdu), self._len_smsc)]
+
+    def _render_7bit(self, values):
+        encode = DEFAULT_CHARSET.encode
+        ud = [self._prefix]
+        partial = self._partial
+        bits = self._fill_bits
+        total = self._prefix_len
+        for i, part in enumerate(self._parts):
+            chunks = []
+            if i:
+                septets, packed = self._literals[i]
+                if septets:
+                    chunks.append((septets, packed))
+
+            if part[1] is not None:
+                try:
+                    data = encode(self._format(part, values))
+                except UnicodeError:
+                    return None
+
+                if data:
+                    chunks.append((len(data), None))
+
+            for septets, packed in chunks:
+                if packed is None:
+                    packed = pack_septets(data, bits)
+                else:
+                    packed = packed[bits]
+                if bits:
+                    # merge the octet shared with the previous septets
+                    packed = bytes((packed[0] | partial,)) + packed[1:]
+
+                total += septets
+                full, bits = divmod(bits + septets * 7, 8)
+                ud.append(packed[:full])
+                partial = packed[full] if bits else 0
+
+        if total > self._capacity:
+            return None
+
+        if bits:
+            ud.append(bytes((partial,)))
+
+        return bytes((total,)) + b''.join(ud)
+
+    def _render_ucs2(self, values):
+        ud = []
+        for literal, part in zip(self._literals, self._parts):
+            ud.append(literal)
+            if part[1] is not None:
+                ud.append(self._format(part, values).encode('utf-16-be'))
+
+        ud = b''.join(ud)
+        if len(ud) > consts.EIGHTBIT_SIZE:
+            return None
+
+        return bytes((len(ud),)) + ud
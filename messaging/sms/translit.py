@@ -0,0 +1,233 @@
+# See LICENSE
+"""Transliteration of text that does not fit in the GSM 7 bit alphabet"""
+
+import unicodedata
+
+from messaging.sms.gsm0338 import (DEFAULT_CHARSET, GSM_BASIC_CHARSET,
+                                   GSM_REPLACE_CHARSET)
+
+QUOTES = {
+    '\u0060': "'",          # GRAVE ACCENT
+    '\u00B4': "'",          # ACUTE ACCENT
+    '\u2018': "'",          # LEFT SINGLE QUOTATION MARK
+    '\u2019': "'",          # RIGHT SINGLE QUOTATION MARK
+    '\u201A': "'",          # SINGLE LOW-9 QUOTATION MARK
+    '\u201B': "'",          # SINGLE HIGH-REVERSED-9 QUOTATION MARK
+    '\u2032': "'",          # PRIME
+    '\u2039': "'",          # SINGLE LEFT-POINTING ANGLE QUOTATION MARK
+    '\u203A': "'",          # SINGLE RIGHT-POINTING ANGLE QUOTATION MARK
+    '\u00AB': '"',          # LEFT-POINTING DOUBLE ANGLE QUOTATION MARK
+    '\u00BB': '"',          # RIGHT-POINTING DOUBLE ANGLE QUOTATION MARK
+    '\u201C': '"',          # LEFT DOUBLE QUOTATION MARK
+    '\u201D': '"',          # RIGHT DOUBLE QUOTATION MARK
+    '\u201E': '"',          # DOUBLE LOW-9 QUOTATION MARK
+    '\u201F': '"',          # DOUBLE HIGH-REVERSED-9 QUOTATION MARK
+    '\u2033': '"',          # DOUBLE PRIME
+}
+
+DASHES = {
+    '\u00AD': '',           # SOFT HYPHEN
+    '\u2010': '-',          # HYPHEN
+    '\u2011': '-',          # NON-BREAKING HYPHEN
+    '\u2012': '-',          # FIGURE DASH
+    '\u2013': '-',          # EN DASH
+    '\u2014': '-',          # EM DASH
+    '\u2015': '-',          # HORIZONTAL BAR
+    '\u2212': '-',          # MINUS SIGN
+}
+
+PUNCTUATION = {
+    '\u2026': '...',        # HORIZONTAL ELLIPSIS
+    '\u2022': '*',          # BULLET
+    '\u00B7': '.',          # MIDDLE DOT
+    '\u00D7': 'x',          # MULTIPLICATION SIGN
+    '\u00F7': '/',          # DIVISION SIGN
+    '\u2044': '/',          # FRACTION SLASH
+    '\u00A9': '(C)',        # COPYRIGHT SIGN
+    '\u00AE': '(R)',        # REGISTERED SIGN
+    '\u2122': 'TM',         # TRADE MARK SIGN
+}
+
+SPACES = {
+    '\u0009': ' ',          # CHARACTER TABULATION
+    '\u00A0': ' ',          # NO-BREAK SPACE
+    '\u2002': ' ',          # EN SPACE
+    '\u2003': ' ',          # EM SPACE
+    '\u2004': ' ',          # THREE-PER-EM SPACE
+    '\u2005': ' ',          # FOUR-PER-EM SPACE
+    '\u2006': ' ',          # SIX-PER-EM SPACE
+    '\u2007': ' ',          # FIGURE SPACE
+    '\u2008': ' ',          # PUNCTUATION SPACE
+    '\u2009': ' ',          # THIN SPACE
+    '\u200A': ' ',          # HAIR SPACE
+    '\u202F': ' ',          # NARROW NO-BREAK SPACE
+    '\u205F': ' ',          # MEDIUM MATHEMATICAL SPACE
+    '\u3000': ' ',          # IDEOGRAPHIC SPACE
+    '\u200B': '',           # ZERO WIDTH SPACE
+    '\u200C': '',           # ZERO WIDTH NON-JOINER
+    '\u200D': '',           # ZERO WIDTH JOINER
+    '\u2060': '',           # WORD JOINER
+    '\uFEFF': '',           # ZERO WIDTH NO-BREAK SPACE
+}
+
+# Latin letters without a canonical decomposition
+LATIN_LETTERS = {
+    '\u00D0': 'D',          # LATIN CAPITAL LETTER ETH
+    '\u00DE': 'Th',         # LATIN CAPITAL LETTER THORN
+    '\u00F0': 'd',          # LATIN SMALL LETTER ETH
+    '\u00FE': 'th',         # LATIN SMALL LETTER THORN
+    '\u0110': 'D',          # LATIN CAPITAL LETTER D WITH STROKE
+    '\u0111': 'd',          # LATIN SMALL LETTER D WITH STROKE
+    '\u0126': 'H',          # LATIN CAPITAL LETTER H WITH STROKE
+    '\u0127': 'h',          # LATIN SMALL LETTER H WITH STROKE
+    '\u0131': 'i',          # LATIN SMALL LETTER DOTLESS I
+    '\u0132': 'IJ',         # LATIN CAPITAL LIGATURE IJ
+    '\u0133': 'ij',         # LATIN SMALL LIGATURE IJ
+    '\u013F': 'L',          # LATIN CAPITAL LETTER L WITH MIDDLE DOT
+    '\u0140': 'l',          # LATIN SMALL LETTER L WITH MIDDLE DOT
+    '\u0141': 'L',          # LATIN CAPITAL LETTER L WITH STROKE
+    '\u0142': 'l',          # LATIN SMALL LETTER L WITH STROKE
+    '\u014A': 'N',          # LATIN CAPITAL LETTER ENG
+    '\u014B': 'n',          # LATIN SMALL LETTER ENG
+    '\u0152': 'OE',         # LATIN CAPITAL LIGATURE OE
+    '\u0153': 'oe',         # LATIN SMALL LIGATURE OE
+    '\u0166': 'T',          # LATIN CAPITAL LETTER T WITH STROKE
+    '\u0167': 't',          # LATIN SMALL LETTER T WITH STROKE
+    '\u017F': 's',          # LATIN SMALL LETTER LONG S
+}
+
+# Russian, Ukrainian and Belarusian, loosely following BGN/PCGN
+CYRILLIC = {
+    '\u0410': 'A',          # CYRILLIC CAPITAL LETTER A
+    '\u0430': 'a',          # CYRILLIC SMALL LETTER A
+    '\u0411': 'B',          # CYRILLIC CAPITAL LETTER BE
+    '\u0431': 'b',          # CYRILLIC SMALL LETTER BE
+    '\u0412': 'V',          # CYRILLIC CAPITAL LETTER VE
+    '\u0432': 'v',          # CYRILLIC SMALL LETTER VE
+    '\u0413': 'G',          # CYRILLIC CAPITAL LETTER GHE
+    '\u0433': 'g',          # CYRILLIC SMALL LETTER GHE
+    '\u0414': 'D',          # CYRILLIC CAPITAL LETTER DE
+    '\u0434': 'd',          # CYRILLIC SMALL LETTER DE
+    '\u0415': 'E',          # CYRILLIC CAPITAL LETTER IE
+    '\u0435': 'e',          # CYRILLIC SMALL LETTER IE
+    '\u0401': 'Yo',         # CYRILLIC CAPITAL LETTER IO
+    '\u0451': 'yo',         # CYRILLIC SMALL LETTER IO
+    '\u0416': 'Zh',         # CYRILLIC CAPITAL LETTER ZHE
+    '\u0436': 'zh',         # CYRILLIC SMALL LETTER ZHE
+    '\u0417': 'Z',          # CYRILLIC CAPITAL LETTER ZE
+    '\u0437': 'z',          # CYRILLIC SMALL LETTER ZE
+    '\u0418': 'I',          # CYRILLIC CAPITAL LETTER I
+    '\u0438': 'i',          # CYRILLIC SMALL LETTER I
+    '\u0419': 'Y',          # CYRILLIC CAPITAL LETTER SHORT I
+    '\u0439': 'y',          # CYRILLIC SMALL LETTER SHORT I
+    '\u041A': 'K',          # CYRILLIC CAPITAL LETTER KA
+    '\u043A': 'k',          # CYRILLIC SMALL LETTER KA
+    '\u041B': 'L',          # CYRILLIC CAPITAL LETTER EL
+    '\u043B': 'l',          # CYRILLIC SMALL LETTER EL
+    '\u041C': 'M',          # CYRILLIC CAPITAL LETTER EM
+    '\u043C': 'm',          # CYRILLIC SMALL LETTER EM
+    '\u041D': 'N',          # CYRILLIC CAPITAL LETTER EN
+    '\u043D': 'n',          # CYRILLIC SMALL LETTER EN
+    '\u041E': 'O',          # CYRILLIC CAPITAL LETTER O
+    '\u043E': 'o',          # CYRILLIC SMALL LETTER O
+    '\u041F': 'P',          # CYRILLIC CAPITAL LETTER PE
+    '\u043F': 'p',          # CYRILLIC SMALL LETTER PE
+    '\u0420': 'R',          # CYRILLIC CAPITAL LETTER ER
+    '\u0440': 'r',          # CYRILLIC SMALL LETTER ER
+    '\u0421': 'S',          # CYRILLIC CAPITAL LETTER ES
+    '\u0441': 's',          # CYRILLIC SMALL LETTER ES
+    '\u0422': 'T',          # CYRILLIC CAPITAL LETTER TE
+    '\u0442': 't',          # CYRILLIC SMALL LETTER TE
+    '\u0423': 'U',          # CYRILLIC CAPITAL LETTER U
+    '\u0443': 'u',          # CYRILLIC SMALL LETTER U
+    '\u0424': 'F',          # CYRILLIC CAPITAL LETTER EF
+    '\u0444': 'f',          # CYRILLIC SMALL LETTER EF
+    '\u0425': 'Kh',         # CYRILLIC CAPITAL LETTER HA
+    '\u0445': 'kh',         # CYRILLIC SMALL LETTER HA
+    '\u0426': 'Ts',         # CYRILLIC CAPITAL LETTER TSE
+    '\u0446': 'ts',         # CYRILLIC SMALL LETTER TSE
+    '\u0427': 'Ch',         # CYRILLIC CAPITAL LETTER CHE
+    '\u0447': 'ch',         # CYRILLIC SMALL LETTER CHE
+    '\u0428': 'Sh',         # CYRILLIC CAPITAL LETTER SHA
+    '\u0448': 'sh',         # CYRILLIC SMALL LETTER SHA
+    '\u0429': 'Shch',       # CYRILLIC CAPITAL LETTER SHCHA
+    '\u0449': 'shch',       # CYRILLIC SMALL LETTER SHCHA
+    '\u042A': '',           # CYRILLIC CAPITAL LETTER HARD SIGN
+    '\u044A': '',           # CYRILLIC SMALL LETTER HARD SIGN
+    '\u042B': 'Y',          # CYRILLIC CAPITAL LETTER YERU
+    '\u044B': 'y',          # CYRILLIC SMALL LETTER YERU
+    '\u042C': '',           # CYRILLIC CAPITAL LETTER SOFT SIGN
+    '\u044C': '',           # CYRILLIC SMALL LETTER SOFT SIGN
+    '\u042D': 'E',          # CYRILLIC CAPITAL LETTER E
+    '\u044D': 'e',          # CYRILLIC SMALL LETTER E
+    '\u042E': 'Yu',         # CYRILLIC CAPITAL LETTER YU
+    '\u044E': 'yu',         # CYRILLIC SMALL LETTER YU
+    '\u042F': 'Ya',         # CYRILLIC CAPITAL LETTER YA
+    '\u044F': 'ya',         # CYRILLIC SMALL LETTER YA
+    '\u0404': 'Ye',         # CYRILLIC CAPITAL LETTER UKRAINIAN IE
+    '\u0454': 'ye',         # CYRILLIC SMALL LETTER UKRAINIAN IE
+    '\u0406': 'I',          # CYRILLIC CAPITAL LETTER BYELORUSSIAN-UKRAINIAN I
+    '\u0456': 'i',          # CYRILLIC SMALL LETTER BYELORUSSIAN-UKRAINIAN I
+    '\u0407': 'Yi',         # CYRILLIC CAPITAL LETTER YI
+    '\u0457': 'yi',         # CYRILLIC SMALL LETTER YI
+    '\u0490': 'G',          # CYRILLIC CAPITAL LETTER GHE WITH UPTURN
+    '\u0491': 'g',          # CYRILLIC SMALL LETTER GHE WITH UPTURN
+    '\u040E': 'U',          # CYRILLIC CAPITAL LETTER SHORT U
+    '\u045E': 'u',          # CYRILLIC SMALL LETTER SHORT U
+}
+
+
+def _latin_diacritics():
+    # letters of the Latin blocks that are not in the GSM alphabet but
+    # decompose into an ASCII letter and combining marks
+    table = {}
+    ranges = (range(0x00C0, 0x0250), range(0x1E00, 0x1F00))
+    for i in (i for r in ranges for i in r):
+        char = chr(i)
+        if char in DEFAULT_CHARSET.chars:
+            continue
+
+        base = unicodedata.normalize('NFD', char)[0]
+        if base != char and base.isascii() and base.isalpha():
+            table[char] = base
+
+    # the replacements that the gsm0338 codec uses with errors='replace'
+    for char, gsm in GSM_REPLACE_CHARSET.items():
+        table[char] = GSM_BASIC_CHARSET[gsm]
+
+    table.update(LATIN_LETTERS)
+    return table
+
+
+DIACRITICS = _latin_diacritics()
+
+
+class TranslitTable(dict):
+    """
+    ``str.translate`` table built from character -> replacement maps
+
+    Later maps take precedence over earlier ones
+    """
+
+    def __init__(self, *tables):
+        super(TranslitTable, self).__init__()
+        for table in tables:
+            for char, replacement in table.items():
+                self[ord(char)] = replacement
+
+        self._drop = dict.fromkeys(self)
+
+    def substitutions(self, text):
+        """Returns how many characters of ``text`` would be replaced"""
+        return len(text) - len(text.translate(self._drop))
+
+    def transliterate(self, text):
+        """Returns ``text`` transliterated and the substitutions made"""
+        return text.translate(self), self.substitutions(text)
+
+
+DEFAULT_TABLE = TranslitTable(QUOTES, DASHES, PUNCTUATION, SPACES,
+                              DIACRITICS)
+
+CYRILLIC_TABLE = TranslitTable(QUOTES, DASHES, PUNCTUATION, SPACES,
+                               DIACRITICS, CYRILLIC)
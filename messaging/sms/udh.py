@@ -1,7 +1,32 @@
 # See LICENSE
+"""User Data Header (3GPP TS 23.040 9.2.3.24) parser and builder"""
+
+from struct import Struct
+
+# Information Element Identifiers
+IEI_CONCAT_8BIT = 0x00
+IEI_SPECIAL_SMS = 0x01
+IEI_PORT_8BIT = 0x04
+IEI_PORT_16BIT = 0x05
+IEI_CONCAT_16BIT = 0x08
+IEI_NATIONAL_SINGLE_SHIFT = 0x24
+IEI_NATIONAL_LOCKING_SHIFT = 0x25
+
+# Enhanced Messaging Service IEs (text formatting, sounds, animations,
+# pictures, user prompt indicator, extended objects, ...)
+EMS_IEIS = frozenset(range(0x0A, 0x20))
+
+# precomputed IE templates: IEI and IE length are constant per IE
+_CONCAT_8BIT = Struct(">BBBBB")
+_CONCAT_16BIT = Struct(">BBHBB")
+_PORT_8BIT = Struct(">BBBB")
+_PORT_16BIT = Struct(">BBHH")
+_SPECIAL_SMS = Struct(">BBBB")
+_SHIFT = Struct(">BBB")
 
 
 class PortAddress:
+    __slots__ = ('dest_port', 'orig_port', 'eight_bits')
 
     def __init__(self, dest_port, orig_port, eight_bits):
         self.dest_port = dest_port
@@ -12,8 +37,18 @@ class PortAddress:
         args = (self.dest_port, self.orig_port)
         return "<PortAddress dest_port: %d orig_port: %d>" % args
 
+    def to_bytes(self):
+        """Returns the IE (IEI + IEDL + IED) as bytes"""
+        if self.eight_bits:
+            return _PORT_8BIT.pack(IEI_PORT_8BIT, 2,
+                                   self.dest_port, self.orig_port)
+
+        return _PORT_16BIT.pack(IEI_PORT_16BIT, 4,
+                                self.dest_port, self.orig_port)
+
 
 class ConcatReference:
+    __slots__ = ('ref', 'cnt', 'seq', 'eight_bits')
 
     def __init__(self, ref, cnt, seq, eight_bits):
         self.ref = ref
@@ -25,12 +60,48 @@ class ConcatReference:
         args = (self.ref, self.cnt, self.seq)
         return "<ConcatReference ref: %d cnt: %d seq: %d>" % args
 
+    def to_bytes(self):
+        """Returns the IE (IEI + IEDL + IED) as bytes"""
+        if self.eight_bits:
+            return _CONCAT_8BIT.pack(IEI_CONCAT_8BIT, 3,
+                                     self.ref & 0xFF, self.cnt, self.seq)
 
-class UserDataHeader:
+        return _CONCAT_16BIT.pack(IEI_CONCAT_16BIT, 4,
+                                  self.ref & 0xFFFF, self.cnt, self.seq)
+
+
+class SpecialSmsIndication:
+    """Message waiting indication (voicemail, fax, email, other)"""
+    __slots__ = ('store', 'msg_type', 'count')
+
+    def __init__(self, store, msg_type, count):
+        self.store = store
+        self.msg_type = msg_type
+        self.count = count
+
+    def __repr__(self):
+        args = (self.msg_type, self.count, self.store)
+        return "<SpecialSmsIndication type: %d count: %d store: %s>" % args
 
-    def __init__(self):
-        self.concat = None
-        self.ports = None
+    def to_bytes(self):
+        """Returns the IE (IEI + IEDL + IED) as bytes"""
+        octet = (self.msg_type & 0x7F) | (0x80 if self.store else 0x00)
+        return _SPECIAL_SMS.pack(IEI_SPECIAL_SMS, 2, octet, self.count)
+
+
+class UserDataHeader:
+    __slots__ = ('concat', 'ports', 'special', 'single_shift',
+                 'locking_shift', 'ems', 'headers')
+
+    def __init__(self, concat=None, ports=None):
+        self.concat = concat
+        self.ports = ports
+        self.special = []
+        # national language identifiers (3GPP TS 23.038 6.2.1.2.4)
+        self.single_shift = None
+        self.locking_shift = None
+        # EMS IEs, in order of appearance: [(iei, data), ...]
+        self.ems = []
         self.headers = {}
 
     def __repr__(self):
@@ -39,41 +110,94 @@ class UserDataHeader:
 
     @classmethod
     def from_status_report_ref(cls, ref):
-        udh = cls()
-        udh.concat = ConcatReference(ref, 0, 0, True)
-        return udh
+        return cls(concat=ConcatReference(ref, 0, 0, True))
 
     @classmethod
     def from_bytes(cls, data):
+        """
+        Parses the IEs in ``data`` (the UDH without its UDHL octet)
+
+        ``data`` may be any object supporting the buffer protocol
+        (:class:`array.array`, ``bytes``, ``bytearray``, ...) or a list
+        of ints
+        """
         udh = cls()
-        while len(data):
-            iei = data.pop(0)
-            ie_len = data.pop(0)
-            ie_data = data[:ie_len]
-            data = data[ie_len:]
+        if isinstance(data, list):
+            data = bytes(data)
+
+        view = memoryview(data).cast('B')
+        end = len(view)
+        i = 0
+        while i < end:
+            if i + 2 > end:
+                raise ValueError("Truncated UDH at offset %d" % i)
+
+            iei = view[i]
+            ie_len = view[i + 1]
+            i += 2
+            if i + ie_len > end:
+                raise ValueError("Truncated UDH IE 0x%02x" % iei)
+
+            ie_data = view[i:i + ie_len].tobytes()
+            i += ie_len
             udh.headers[iei] = ie_data
 
-            if iei == 0x00:
-                # process SM concatenation 8bit ref.
+            if iei == IEI_CONCAT_8BIT and ie_len == 3:
                 ref, cnt, seq = ie_data
                 udh.concat = ConcatReference(ref, cnt, seq, True)
 
-            if iei == 0x08:
-                # process SM concatenation 16bit ref.
+            elif iei == IEI_CONCAT_16BIT and ie_len == 4:
                 ref = ie_data[0] << 8 | ie_data[1]
-                cnt = ie_data[2]
-                seq = ie_data[3]
-                udh.concat = ConcatReference(ref, cnt, seq, False)
+                udh.concat = ConcatReference(ref, ie_data[2], ie_data[3],
+                                             False)
 
-            elif iei == 0x04:
-                # process App port addressing 8bit
+            elif iei == IEI_PORT_8BIT and ie_len == 2:
                 dest_port, orig_port = ie_data
-                udh.ports = PortAddress(dest_port, orig_port, False)
+                udh.ports = PortAddress(dest_port, orig_port, True)
 
-            elif iei == 0x05:
-                # process App port addressing 16bit
+            elif iei == IEI_PORT_16BIT and ie_len == 4:
                 dest_port = ie_data[0] << 8 | ie_data[1]
                 orig_port = ie_data[2] << 8 | ie_data[3]
                 udh.ports = PortAddress(dest_port, orig_port, False)
 
+            elif iei == IEI_SPECIAL_SMS and ie_len == 2:
+                octet, count = ie_data
+                udh.special.append(
+                    SpecialSmsIndication(bool(octet & 0x80),
+                                         octet & 0x7F, count))
+
+            elif iei == IEI_NATIONAL_SINGLE_SHIFT and ie_len == 1:
+                udh.single_shift = ie_data[0]
+
+            elif iei == IEI_NATIONAL_LOCKING_SHIFT and ie_len == 1:
+                udh.locking_shift = ie_data[0]
+
+            elif iei in EMS_IEIS:
+                udh.ems.append((iei, ie_data))
+
         return udh
+
+    def ies_to_bytes(self):
+        """Returns the encoded IEs, without the UDHL octet"""
+        ies = []
+        for special in self.special:
+            ies.append(special.to_bytes())
+        if self.concat is not None:
+            ies.append(self.concat.to_bytes())
+        if self.ports is not None:
+            ies.append(self.ports.to_bytes())
+        if self.single_shift is not None:
+            ies.append(_SHIFT.pack(IEI_NATIONAL_SINGLE_SHIFT, 1,
+                                   self.single_shift))
+        if self.locking_shift is not None:
+            ies.append(_SHIFT.pack(IEI_NATIONAL_LOCKING_SHIFT, 1,
+                                   self.locking_shift))
+        for iei, data in self.ems:
+            ies.append(bytes((iei, len(data))) + data)
+
+        return b''.join(ies)
+
+    def to_bytes(self):
+        """Returns the UDH, including its leading UDHL octet"""
+        ies = self.ies_to_bytes()
+        return bytes((len(ies),)) + ies
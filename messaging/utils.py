@@ -1,5 +1,6 @@
 from array import array
-from datetime import timedelta, tzinfo
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
 from math import floor
 import re
 import binascii
@@ -46,6 +47,10 @@ class FixedOffset(tzinfo):
         return timedelta(0)
 
 
+# octet -> octet with its nibbles swapped, for bytes.translate
+NIBBLE_SWAP = bytes(((o & 0x0F) << 4) | (o >> 4) for o in range(256))
+
+
 def bytes_to_str(b):
     if isinstance(b, bytes):
         return b.decode()
@@ -99,82 +104,107 @@ def encode_bytes(b):
     return binascii.hexlify(b).decode()
 
 
-def pack_8bits_to_7bits(message, udh=None):
-    pdu = ""
-    txt = bytes_to_str(message)
+def _udh_bytes(udh):
     if udh is None:
-        tl = len(txt)
-        txt += '\x00'
-        msgl = int(len(txt) * 7 / 8)
-        op = [-1] * msgl
-        c = shift = 0
+        return b''
 
-        for n in range(msgl):
-            if shift == 6:
-                c += 1
+    if isinstance(udh, str):
+        return udh.encode('latin-1')
 
-            shift = n % 7
-            lb = ord(txt[c]) >> shift
-            hb = (ord(txt[c + 1]) << (7 - shift) & 255)
-            op[n] = lb + hb
-            c += 1
+    return bytes(udh)
 
-        pdu = chr(tl) + ''.join(map(chr, op))
-    else:
-        txt = "\x00\x00\x00\x00\x00\x00" + txt
-        tl = len(txt)
 
-        txt += '\x00'
-        msgl = int(len(txt) * 7 / 8)
-        op = [-1] * msgl
-        c = shift = 0
+def udh_septets(udh_len):
+    """
+    Returns the septets taken by a UDH of ``udh_len`` octets in a 7 bit
+    message and the fill bits after it, which align the text to a septet
+    boundary
 
-        for n in range(msgl):
-            if shift == 6:
-                c += 1
+    :param udh_len: length of the UDH, UDHL octet included
+    :rtype: tuple
+    """
+    headlen = (udh_len * 8 + 6) // 7
+    return headlen, headlen * 7 - udh_len * 8
 
-            shift = n % 7
-            lb = ord(txt[c]) >> shift
-            hb = (ord(txt[c + 1]) << (7 - shift) & 255)
-            op[n] = lb + hb
-            c += 1
 
-        for i, char in enumerate(udh):
-            op[i] = ord(char)
+def pack_ud_7bit(septets, udh=b''):
+    """
+    Returns the TP-UDL and TP-UD of a 7 bit message
+
+    The text is aligned to a septet boundary after the UDH with fill bits
 
-        pdu = chr(tl) + ''.join(map(chr, op))
+    :param septets: the GSM characters, one per octet
+    :type septets: bytes
+    :param udh: the UDH, UDHL octet included
+    :type udh: bytes
+    :rtype: bytes
+    """
+    headlen, fill_bits = udh_septets(len(udh))
+    return (bytes((headlen + len(septets),)) + udh +
+            pack_septets(septets, fill_bits))
 
-    return encode_str(pdu)
+
+def pack_ud_8bit(data, udh=b''):
+    """
+    Returns the TP-UDL and TP-UD of a 8 bit message
+
+    :type data: bytes
+    :param udh: the UDH, UDHL octet included
+    :rtype: bytes
+    """
+    return bytes((len(udh) + len(data),)) + udh + data
+
+
+def pack_ud_ucs2(text, udh=b''):
+    """
+    Returns the TP-UDL and TP-UD of a UCS2 message
+
+    Characters outside the BMP take a UTF-16 surrogate pair
+
+    :type text: str
+    :param udh: the UDH, UDHL octet included
+    :rtype: bytes
+    """
+    data = text.encode('utf-16-be')
+    return bytes((len(udh) + len(data),)) + udh + data
+
+
+def pack_8bits_to_7bits(message, udh=None):
+    """
+    Returns the hex encoded TP-UDL and TP-UD of a 7 bit message
+
+    Unlike :func:`pack_ud_7bit`, a message with a UDH must start with
+    the septet holding its fill bits, if any
+    """
+    if isinstance(message, str):
+        message = message.encode('latin-1')
+
+    if udh is None:
+        return encode_bytes(bytes((len(message),)) + pack_septets(message))
+
+    # room for the UDH, the caller adds the fill bits
+    udh = _udh_bytes(udh)
+    message = b'\x00' * (len(udh) * 8 // 7) + message
+    packed = udh + pack_septets(message)[len(udh):]
+    return encode_bytes(bytes((len(message),)) + packed)
 
 
 def pack_8bits_to_8bit(message, udh=None):
-    text = message
-    if udh is not None:
-        if isinstance(udh, bytes):
-            udh = udh.decode()
-        text = udh + text
+    """Returns the hex encoded TP-UDL and TP-UD of a 8 bit message"""
+    if isinstance(message, str):
+        message = message.encode('latin-1')
 
-    mlen = len(text)
-    message = chr(mlen) + message
-    return encode_str(message)
+    return encode_bytes(pack_ud_8bit(message, _udh_bytes(udh)))
 
 
 def pack_8bits_to_ucs2(message, udh=None):
-    # XXX: This does not control the size respect to UDH
-    text = message
-    nmesg = ''
+    """Returns the hex encoded TP-UDL and TP-UD of a UCS2 message"""
+    if isinstance(udh, str):
+        # a str UDH is encoded along with the text
+        return encode_bytes(pack_ud_ucs2(udh + message))
 
-    if udh is not None:
-        if isinstance(udh, bytes):
-            udh = udh.decode()
-        text = udh + text
+    return encode_bytes(pack_ud_ucs2(message, _udh_bytes(udh)))
 
-    for n in text:
-        nmesg += chr(ord(n) >> 8) + chr(ord(n) & 0xFF)
-
-    mlen = len(text) * 2
-    message = chr(mlen) + nmesg
-    return encode_str(message)
 
 def unpack_msg(pdu):
     if isinstance(pdu, (array, list)):
@@ -278,6 +308,141 @@ def unpack_list_msg(pdu):
     return bytes(result)
 
 
+@lru_cache(maxsize=256)
+def _scts_timezone(quarters):
+    return timezone(timedelta(minutes=quarters * 15))
+
+
+def _semi_octet(o):
+    return (o & 0x0F) * 10 + (o >> 4)
+
+
+def decode_scts(data):
+    """
+    Decode a TP-SCTS (or TP-DT) into a timezone-aware datetime
+
+    :param data: the seven semi-octet encoded octets
+    :type data: sequence of int
+    :return: the timestamp in the sender's UTC offset
+    :rtype: datetime.datetime
+    """
+    year, month, day, hour, minute, second, tz = data[:7]
+    year = _semi_octet(year)
+    # same pivot as strptime's %y
+    year += 1900 if year >= 69 else 2000
+
+    quarters = (tz & 0x07) * 10 + (tz >> 4)
+    if tz & 0x08:
+        quarters = -quarters
+
+    return datetime(year, _semi_octet(month), _semi_octet(day),
+                    _semi_octet(hour), _semi_octet(minute),
+                    _semi_octet(second), 0, _scts_timezone(quarters))
+
+
+def _slot_masks(shifts, positions):
+    """
+    Masks moving the septets of a 64 bit slot, in ``len(shifts)`` stages
+
+    At every stage the septets whose index has the shift's bit set are
+    selected, so that septet ``j`` ends up moved by ``j`` bits
+    """
+    positions = list(positions)
+    masks = []
+    for shift in shifts:
+        mask = 0
+        for j in range(8):
+            if j & abs(shift):
+                mask |= 0x7F << positions[j]
+                positions[j] += shift
+
+        masks.append((shift, mask))
+
+    return tuple(masks)
+
+
+# septet j from bit 7 * j to bit 8 * j of its slot, and back
+_SPREAD = _slot_masks((4, 2, 1), range(0, 56, 7))
+_SQUEEZE = _slot_masks((-1, -2, -4), range(0, 64, 8))
+
+
+@lru_cache(maxsize=64)
+def _septet_masks(slots, stages):
+    """Returns ``stages`` with their masks repeated over ``slots`` slots"""
+    repeat = int.from_bytes(b'\x01\x00\x00\x00\x00\x00\x00\x00' * slots,
+                            'little')
+    return tuple((shift, mask * repeat) for shift, mask in stages)
+
+
+def _move_septets(n, slots, stages):
+    for shift, mask in _septet_masks(slots, stages):
+        if shift > 0:
+            n = (n & ~mask) | ((n & mask) << shift)
+        else:
+            n = (n & ~mask) | ((n & mask) >> -shift)
+
+    return n
+
+
+def pack_septets(data, fill_bits=0):
+    """
+    Packs ``data``, one septet per octet, into octets
+
+    The septets of the whole message are moved in place with a few big
+    integer operations rather than bit by bit
+
+    :param data: the septets
+    :type data: bytes
+    :param fill_bits: number of zero bits preceding the first septet,
+                      e.g. to align the text after a UDH
+    :return: the packed septets, the last octet padded with zero bits
+    :rtype: bytes
+    """
+    slots = (len(data) + 7) // 8
+    n = _move_septets(int.from_bytes(data, 'little'), slots, _SQUEEZE)
+    raw = n.to_bytes(slots * 8, 'little')
+    # drop the octet left empty at the end of every slot
+    packed = b''.join([raw[i:i + 7] for i in range(0, len(raw), 8)])
+
+    length = (len(data) * 7 + fill_bits + 7) // 8
+    if fill_bits:
+        n = int.from_bytes(packed, 'little') << fill_bits
+        return n.to_bytes(length + 1, 'little')[:length]
+
+    return packed[:length]
+
+
+def unpack_septets(data, count=None, fill_bits=0):
+    """
+    Unpacks the septets packed in ``data``
+
+    The septets of the whole message are moved in place with a few big
+    integer operations rather than octet by octet
+
+    :param data: packed septets
+    :type data: bytes
+    :param count: number of septets to unpack, defaults to all of them.
+                  A truncated ``data`` only yields the septets it holds.
+    :param fill_bits: number of fill bits preceding the first septet
+    :return: one septet per octet
+    :rtype: bytes
+    """
+    data = bytes(data)
+    available = (len(data) * 8 - fill_bits) // 7
+    if count is None or count > available:
+        count = available
+
+    if fill_bits:
+        n = int.from_bytes(data, 'little') >> fill_bits
+        data = n.to_bytes(len(data), 'little')
+
+    # one 64 bit slot per 7 octets
+    groups = [data[i:i + 7] for i in range(0, len(data), 7)]
+    n = int.from_bytes(b'\x00'.join(groups), 'little')
+    n = _move_septets(n, len(groups), _SPREAD)
+    return n.to_bytes(len(groups) * 8, 'little')[:count]
+
+
 def timedelta_to_relative_validity(t):
     """
     Convert ``t`` to its relative validity period
@@ -0,0 +1,65 @@
+from unittest import TestCase
+
+from messaging.sms.at import ResponseParser, iter_messages, REC_READ
+
+PDU_1 = "07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07"
+PDU_2 = "07914306073011F0040B914316709807F2000880604290224080084E2D5174901A8BAF"
+SR_PDU = "0791538375000075061805810531F1019082416500400190824165004000"
+
+CMGL = ('AT+CMGL=4\r\r\n'
+        '+CMGL: 1,1,,35\r\n%s\r\n'
+        '+CMGL: 2,0,"a,b",28\r\n%s\r\n'
+        '\r\nOK\r\n' % (PDU_1, PDU_2)).encode()
+
+
+class TestResponseParser(TestCase):
+
+    def test_parse_cmgl_in_chunks(self):
+        for size in (1, 3, 7, len(CMGL)):
+            chunks = [CMGL[i:i + size] for i in range(0, len(CMGL), size)]
+            msgs = list(iter_messages(chunks))
+
+            self.assertEqual(len(msgs), 2)
+            self.assertEqual(msgs[0].kind, 'CMGL')
+            self.assertEqual(msgs[0].index, 1)
+            self.assertEqual(msgs[0].stat, REC_READ)
+            self.assertEqual(msgs[0].length, 35)
+            self.assertEqual(msgs[0].sms.text, "How are you?")
+            self.assertEqual(msgs[1].index, 2)
+            self.assertEqual(msgs[1].stat, 0)
+            self.assertEqual(msgs[1].sms.text, "中兴通讯")
+
+    def test_parse_unsolicited(self):
+        lines = []
+
+        class Parser(ResponseParser):
+            def line_received(self, line):
+                lines.append(line)
+
+        parser = Parser()
+        data = ('\r\n+CMT: ,35\r\n%s\r\n\r\n+CDS: 25\r\n%s\r\n'
+                '+CMGR: 1,,35\r\n%s\r\nOK\r\n' % (PDU_1, SR_PDU, PDU_1))
+        msgs = list(parser.feed(data.encode()))
+
+        self.assertEqual([m.kind for m in msgs], ['CMT', 'CDS', 'CMGR'])
+        self.assertEqual(msgs[0].sms.number, "+31641600986")
+        self.assertEqual(msgs[1].sms.sr['status'], 0)
+        self.assertEqual(msgs[2].stat, 1)
+        self.assertIsNone(msgs[2].index)
+        self.assertEqual(lines, [b'OK'])
+
+    def test_parse_corrupted_pdu(self):
+        lines = []
+
+        class Parser(ResponseParser):
+            def line_received(self, line):
+                lines.append(line)
+
+        parser = Parser()
+        data = (b'\r\n+CMT: ,35\r\n\xff' + PDU_1.encode() +
+                b'\r\n\r\n+CMT: ,35\r\n' + PDU_1.encode() + b'\r\n')
+        msgs = list(parser.feed(data))
+
+        self.assertEqual(len(msgs), 1)
+        self.assertEqual(msgs[0].sms.text, "How are you?")
+        self.assertEqual(lines, [b'\xff' + PDU_1.encode()])
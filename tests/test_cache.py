@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+
+from messaging.sms.cache import EncodeCache
+from messaging.sms.gsm0338 import TURKISH
+from messaging.utils import FixedOffset
+from tests.utils import get_pdus
+
+
+class TestEncodeCache(TestCase):
+
+    def get_pdus(self, text, cache=None, **options):
+        return get_pdus(text, ref=0, cache=cache, **options)
+
+    def test_same_pdus(self):
+        cache = EncodeCache()
+        validity = datetime(2024, 1, 1, 10, 0, tzinfo=FixedOffset(60, "GMT+1"))
+        cases = [
+            ("hello", {}),
+            ("x" * 400, {'rand_id': 1}),
+            ("x" * 400, {'rand_id': 0x1234, 'concat_bits': 16}),
+            ("ő" * 100, {'rand_id': 2, 'validity': timedelta(days=2)}),
+            ("ş" * 200, {'rand_id': 3, 'languages': (TURKISH,)}),
+            ("€" * 100, {'rand_id': 4, 'validity': validity, 'klass': 1}),
+            # the same instant in two time zones, two TP-VP
+            ("hello", {'validity': datetime(2024, 1, 1, 12, 0,
+                                            tzinfo=timezone.utc)}),
+            ("hello", {'validity': datetime(2024, 1, 1, 13, 0,
+                                            tzinfo=FixedOffset(60, "CET"))}),
+        ]
+        for _ in range(2):
+            for text, options in cases:
+                self.assertEqual(self.get_pdus(text, cache, **options),
+                                 self.get_pdus(text, **options))
+
+        self.assertEqual(len(cache), len(cases))
+        self.assertEqual(cache.misses, len(cases))
+        self.assertEqual(cache.hits, len(cases))
+
+    def test_concat_reference(self):
+        cache = EncodeCache()
+        for rand_id in range(3):
+            self.assertEqual(self.get_pdus("x" * 200, cache, rand_id=rand_id),
+                             self.get_pdus("x" * 200, rand_id=rand_id))
+
+        self.assertEqual(cache.hits, 2)
+
+    def test_lru(self):
+        cache = EncodeCache(maxsize=2)
+        for text in ("a", "b", "a", "c", "b"):
+            self.get_pdus(text, cache)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_ttl(self):
+        cache = EncodeCache(ttl=-1)
+        self.get_pdus("hello", cache)
+        self.get_pdus("hello", cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
@@ -17,8 +17,11 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """Unittests for the gsm encoding/decoding module"""
 
+import codecs
+import io
 from unittest import TestCase
 from messaging.sms.gsm0338 import is_valid_gsm, decoding_map # imports GSM7 codec
+from messaging.sms.gsm0338 import decode_packed, encode_packed
 # Reversed from: ftp://ftp.unicode.org/Public/MAPPINGS/ETSI/GSM0338.TXT
 MAP = {
 #    chr(0x0000): (0x0000, 0x00),  # Null
@@ -248,9 +251,126 @@ class TestEncodingFunctions(TestCase):
 
     def test_is_valid_gsm_false(self):
         self.assertFalse(is_valid_gsm(chr(0x00a0)))
+        self.assertFalse(is_valid_gsm(''))
+        self.assertFalse(is_valid_gsm('abc\x1b'))
 
         for i in range(1, 0xffff + 1):
             if chr(i) not in MAP:
                 # Note: it's a little odd, but on error we want to see values
                 if is_valid_gsm(chr(i)):
                     self.assertEqual(BAD, i)
+
+    def test_encoding_error_handling(self):
+        self.assertRaises(UnicodeError, 'a b'.encode, 'gsm0338')
+        self.assertRaises(UnicodeError, 'a`b'.encode, 'gsm0338')
+        self.assertEqual('a`bç€'.encode('gsm0338', 'replace'),
+                         b'a?b\x09\x1b\x65')
+        self.assertEqual('a`bç€'.encode('gsm0338', 'ignore'),
+                         b'ab\x1b\x65')
+
+    def test_decoding_escapes(self):
+        self.assertEqual(b'a\x1b\x65b'.decode('gsm0338'), 'a€b')
+        # invalid escape sequence, trailing escape and double escape
+        self.assertEqual(b'a\x1b\x41'.decode('gsm0338'), 'a\u00a0A')
+        self.assertEqual(b'a\x1b'.decode('gsm0338'), 'a\u00a0')
+        self.assertEqual(b'\x1b\x1b\x65'.decode('gsm0338'), '\u00a0€')
+
+    def test_decoding_invalid_octets(self):
+        self.assertRaises(UnicodeDecodeError, b'a\x80'.decode, 'gsm0338')
+        self.assertEqual(b'a\x80'.decode('gsm0338', 'replace'), 'a\ufffd')
+        self.assertEqual(b'a\x80'.decode('gsm0338', 'ignore'), 'a')
+
+    def test_long_text_round_trip(self):
+        text = ''.join(list(MAP.keys())[1:]).replace(chr(0x00a0), '') * 100
+        text += '{}[]~^|\\€\u000c' * 100
+        self.assertEqual(text.encode('gsm0338').decode('gsm0338'), text)
+
+    def test_national_language_codecs(self):
+        text = "Çağrı İşlem ş€"
+        self.assertRaises(UnicodeError, text.encode, 'gsm0338')
+        # every character is in the Turkish locking shift table
+        self.assertEqual(len(text.encode('gsm0338-tr')), len(text))
+        self.assertEqual(len(text.encode('gsm0338-tr-single')), 20)
+        for codec in ('gsm0338-tr', 'gsm0338-tr-single', 'gsm0338_tr'):
+            self.assertEqual(text.encode(codec).decode(codec), text)
+
+        text = "¿Qué tal? Camión, Ángel"
+        self.assertEqual(text.encode('gsm0338-es').decode('gsm0338-es'), text)
+
+        text = "Informação: você está à vista"
+        encoded = text.encode('gsm0338-pt')
+        self.assertEqual(len(encoded), len(text))
+        self.assertEqual(encoded.decode('gsm0338-pt'), text)
+
+    def test_packed_codec(self):
+        self.assertEqual('hellohello'.encode('gsm0338-packed'),
+                         bytes.fromhex('E8329BFD4697D9EC37'))
+        self.assertEqual(bytes.fromhex('E8329BFD4697D9EC37').decode(
+            'gsm0338-packed'), 'hellohello')
+
+        # 7 spare bits are filled with a CR
+        self.assertEqual('abcdefg'.encode('gsm0338-packed'),
+                         bytes.fromhex('61F1985C369F1B'))
+        for text in ('abcdefg', 'abcdefg@', '€' * 100):
+            self.assertEqual(text.encode('gsm0338-packed').decode(
+                'gsm0338-packed'), text)
+
+        # a CR ending on an octet boundary is doubled rather than lost
+        self.assertEqual('abcdefg\r'.encode('gsm0338-packed'),
+                         bytes.fromhex('61F1985C369F1B0D'))
+        self.assertEqual(bytes.fromhex('61F1985C369F1B0D').decode(
+            'gsm0338-packed'), 'abcdefg\r\r')
+        self.assertEqual('abcdef\r'.encode('gsm0338-packed').decode(
+            'gsm0338-packed'), 'abcdef\r')
+
+    def test_packed_functions(self):
+        text = 'Hello {world} €' * 20
+        for fill_bits in range(7):
+            data = encode_packed(text, fill_bits)
+            septets = len(text.encode('gsm0338'))
+            self.assertEqual(len(data), (septets * 7 + fill_bits + 7) // 8)
+            self.assertEqual(decode_packed(data, septets, fill_bits), text)
+
+
+class TestIncrementalCodec(TestCase):
+
+    DATA = b'a\x1b\x65b\x1b\x28c' * 10
+
+    def test_iterdecode_split_escapes(self):
+        expected = self.DATA.decode('gsm0338')
+        for size in range(1, 8):
+            chunks = [self.DATA[i:i + size]
+                      for i in range(0, len(self.DATA), size)]
+            self.assertEqual(''.join(codecs.iterdecode(chunks, 'gsm0338')),
+                             expected)
+
+    def test_incremental_decoder_state(self):
+        decoder = codecs.getincrementaldecoder('gsm0338')()
+        self.assertEqual(decoder.decode(b'a\x1b'), 'a')
+        state = decoder.getstate()
+        self.assertEqual(state, (b'\x1b', 0))
+
+        decoder.reset()
+        decoder.setstate(state)
+        self.assertEqual(decoder.decode(b'\x65'), '€')
+        self.assertEqual(decoder.decode(b'\x1b', final=True), '\u00a0')
+
+    def test_text_io_wrapper(self):
+        raw = io.BufferedReader(io.BytesIO(self.DATA), buffer_size=3)
+        wrapper = io.TextIOWrapper(raw, encoding='gsm0338')
+        self.assertEqual(wrapper.read(), self.DATA.decode('gsm0338'))
+
+    def test_stream_reader(self):
+        for size in (-1, 1, 2, 3):
+            reader = codecs.getreader('gsm0338')(io.BytesIO(self.DATA))
+            chunks = []
+            while True:
+                chunk = reader.read(size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            self.assertEqual(''.join(chunks), self.DATA.decode('gsm0338'))
+
+        # a trailing ESC is flushed at the end of the stream
+        reader = codecs.getreader('gsm0338')(io.BytesIO(b'ab\x1b'))
+        self.assertEqual(reader.read(), b'ab\x1b'.decode('gsm0338'))
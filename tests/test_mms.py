@@ -5,6 +5,7 @@ import os
 import binascii
 from unittest import TestCase
 
+import messaging
 from messaging.mms.message import MMSMessage
 
 # test data extracted from heyman's
@@ -26,6 +27,23 @@ class TestMmsDecoding(TestCase):
         }
         self.assertEqual(mms.headers, headers)
 
+    def test_decoding_traced(self):
+        events = []
+        messaging.set_tracer(lambda stage, **fields:
+                             events.append((stage, fields)))
+        self.addCleanup(messaging.set_tracer, None)
+
+        path = os.path.join(DATA_DIR, 'iPhone.mms')
+        mms = MMSMessage.from_file(path)
+
+        stages = [stage for stage, _ in events]
+        self.assertEqual(stages, ['mms.decode.part', 'mms.decode.part',
+                                  'mms.decode.body'])
+        self.assertEqual(events[1][1]['content_type'], 'image/jpeg')
+        self.assertEqual(events[1][1]['size'], len(mms.data_parts[1].data))
+        self.assertEqual(events[2][1]['parts'], 2)
+        self.assertGreaterEqual(events[2][1]['elapsed'], 0)
+
     def test_decoding_iPhone_mms(self):
         path = os.path.join(DATA_DIR, 'iPhone.mms')
         mms = MMSMessage.from_file(path)
@@ -0,0 +1,116 @@
+import asyncio
+import os
+from unittest import TestCase
+
+from messaging.sms import SmsSubmit
+from messaging.sms.modem import ModemError, open_serial
+
+PDU = "07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07"
+
+
+class FakeModem:
+    """Answers AT+CMGS on the master side of a pty"""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.buf = b''
+        self.mr = 0
+        self.sent = []
+        # what AT+CMGS is answered with, the prompt if None
+        self.cmgs_error = None
+        asyncio.get_running_loop().add_reader(fd, self.read)
+
+    def write(self, data):
+        os.write(self.fd, data)
+
+    def read(self):
+        self.buf += os.read(self.fd, 4096)
+        while True:
+            if self.buf.startswith(b'AT+CMGS='):
+                end = self.buf.find(b'\r')
+                if end == -1:
+                    return
+                self.buf = self.buf[end + 1:]
+                if self.cmgs_error is not None:
+                    self.write(b'\r\n%s\r\n' % self.cmgs_error)
+                else:
+                    self.write(b'\r\n> ')
+            elif b'\x1a' in self.buf:
+                pdu, self.buf = self.buf.split(b'\x1a', 1)
+                self.sent.append(pdu)
+                self.mr += 1
+                self.write(b'\r\n+CMGS: %d\r\n\r\nOK\r\n' % self.mr)
+            elif b'\r' in self.buf:
+                cmd, self.buf = self.buf.split(b'\r', 1)
+                if cmd == b'AT':
+                    self.write(b'\r\nOK\r\n')
+                else:
+                    self.write(b'\r\nERROR\r\n')
+            else:
+                return
+
+    def close(self):
+        asyncio.get_running_loop().remove_reader(self.fd)
+        os.close(self.fd)
+
+
+class TestModemProtocol(TestCase):
+
+    def run_with_modem(self, test):
+        async def main():
+            master, slave = os.openpty()
+            modem = FakeModem(master)
+            protocol = await open_serial(os.ttyname(slave))
+            os.close(slave)
+            try:
+                await test(protocol, modem)
+            finally:
+                protocol.transport.close()
+                modem.close()
+
+        asyncio.run(main())
+
+    def test_send_multipart(self):
+        async def test(protocol, modem):
+            sms = SmsSubmit("+3530000000", "x" * 400)
+            pdus = sms.to_pdu()
+            refs = await protocol.send(pdus)
+
+            self.assertEqual(refs, [1, 2, 3])
+            self.assertEqual(modem.sent, [p.pdu.encode() for p in pdus])
+
+        self.run_with_modem(test)
+
+    def test_command_and_error(self):
+        async def test(protocol, modem):
+            self.assertEqual(await protocol.command(b'AT'), [])
+            with self.assertRaises(ModemError):
+                await protocol.command(b'AT+FOO')
+
+        self.run_with_modem(test)
+
+    def test_send_error(self):
+        async def test(protocol, modem):
+            modem.cmgs_error = b'+CMS ERROR: 500'
+            sms = SmsSubmit("+3530000000", "hello")
+            with self.assertRaises(ModemError) as cm:
+                await protocol.send(sms, timeout=5)
+
+            self.assertEqual(str(cm.exception), "+CMS ERROR: 500")
+            self.assertEqual(modem.sent, [])
+
+            # the modem is usable afterwards
+            modem.cmgs_error = None
+            self.assertEqual(await protocol.send(sms), [1])
+
+        self.run_with_modem(test)
+
+    def test_unsolicited_cmt(self):
+        async def test(protocol, modem):
+            modem.write(b'\r\n+CMT: ,35\r\n' + PDU.encode() + b'\r\n')
+            msg = await asyncio.wait_for(protocol.messages.get(), 5)
+
+            self.assertEqual(msg.kind, 'CMT')
+            self.assertEqual(msg.sms.text, "How are you?")
+
+        self.run_with_modem(test)
@@ -0,0 +1,162 @@
+from unittest import TestCase
+
+from messaging.sms import SmsSubmit
+from messaging.sms.gsm0338 import (get_charset, PORTUGUESE, SPANISH,
+                                   TURKISH)
+from messaging.sms.planner import (classify, estimate, get_capacity,
+                                   get_udh_len, plan_encoding)
+
+
+class TestEncodingPlanner(TestCase):
+
+    def test_capacity(self):
+        self.assertEqual(get_capacity(0x00), 160)
+        self.assertEqual(get_capacity(0x00, get_udh_len(True)), 153)
+        self.assertEqual(get_capacity(0x04, get_udh_len(True)), 134)
+        self.assertEqual(get_capacity(0x08, get_udh_len(True)), 67)
+        self.assertEqual(get_capacity(0x00, get_udh_len(False, 1, 1)), 152)
+        self.assertEqual(get_capacity(0x00, get_udh_len(True, 1, 1)), 146)
+
+        udh_len = get_udh_len(True, concat_bits=16)
+        self.assertEqual(get_capacity(0x00, udh_len), 152)
+        self.assertEqual(get_capacity(0x04, udh_len), 133)
+        self.assertEqual(get_capacity(0x08, udh_len), 66)
+
+    def test_default_alphabet(self):
+        plan = plan_encoding("hello world", languages=(TURKISH,))
+        self.assertEqual(plan.fmt, 0x00)
+        self.assertEqual(plan.data, b"hello world")
+        self.assertEqual(plan.segments, [(0, 11)])
+        self.assertIsNone(plan.locking_shift)
+        self.assertIsNone(plan.single_shift)
+        self.assertIsNone(plan.get_udh())
+
+        plan = plan_encoding("x" * 307)
+        self.assertEqual(plan.segments, [(0, 153), (153, 306), (306, 307)])
+
+    def test_national_shift_saves_segments(self):
+        text = "ş" * 100
+        self.assertEqual(plan_encoding(text).fmt, 0x08)
+
+        plan = plan_encoding(text, languages=(SPANISH, TURKISH))
+        self.assertEqual(plan.fmt, 0x00)
+        self.assertEqual(plan.locking_shift, TURKISH)
+        self.assertIsNone(plan.single_shift)
+        self.assertEqual(len(plan.segments), 1)
+        self.assertEqual(plan.get_udh().to_bytes(), b"\x03\x25\x01\x01")
+
+        # only the single shift table is needed
+        plan = plan_encoding("á" * 60, languages=(PORTUGUESE,))
+        self.assertEqual(plan.locking_shift, None)
+        self.assertEqual(plan.single_shift, PORTUGUESE)
+
+    def test_ties(self):
+        # the default alphabet is preferred over the shift tables
+        plan = plan_encoding("s" * 10, languages=(TURKISH,))
+        self.assertIsNone(plan.locking_shift)
+
+        # and the shift tables over UCS2
+        plan = plan_encoding("ş" * 10, languages=(TURKISH,))
+        self.assertEqual(plan.fmt, 0x00)
+        self.assertEqual(plan.single_shift, TURKISH)
+        self.assertEqual(plan.data, b"\x1bs" * 10)
+
+    def test_transliteration(self):
+        translit = {ord('“'): '"', ord('”'): '"'}
+        text = '“quoted”'
+        self.assertEqual(plan_encoding(text).fmt, 0x08)
+
+        # one segment either way, 7 bit beats UCS2 once translit is set
+        plan = plan_encoding(text, translit=translit)
+        self.assertEqual(plan.fmt, 0x00)
+        self.assertTrue(plan.transliterated)
+        self.assertEqual(plan.text, '"quoted"')
+
+        # but not the national shift tables
+        plan = plan_encoding('ş', languages=(TURKISH,),
+                             translit={ord('ş'): 's'})
+        self.assertEqual(plan.single_shift, TURKISH)
+        self.assertFalse(plan.transliterated)
+
+        plan = plan_encoding(text * 10, translit=translit)
+        self.assertEqual(plan.fmt, 0x00)
+        self.assertTrue(plan.transliterated)
+        self.assertEqual(plan.text, '"quoted"' * 10)
+
+    def test_forced_fmt(self):
+        plan = plan_encoding("ş" * 100, fmt=0x08, languages=(TURKISH,))
+        self.assertEqual(plan.fmt, 0x08)
+        self.assertEqual(len(plan.segments), 2)
+
+        self.assertRaises(UnicodeError, plan_encoding, "ş", fmt=0x00)
+        self.assertRaises(ValueError, plan_encoding, "x", fmt=0x01)
+
+    def test_submit_uses_plan(self):
+        sms = SmsSubmit("+3530000000", "ş" * 100)
+        sms.languages = (TURKISH,)
+        pdus = sms.to_pdu()
+
+        self.assertEqual(len(pdus), 1)
+        self.assertEqual(sms.fmt, 0x00)
+        self.assertEqual(sms.plan.locking_shift, TURKISH)
+
+    def test_classify(self):
+        info = classify("x" * 150 + "€" * 5)
+        self.assertTrue(info.is_gsm)
+        self.assertEqual(info.septets, 160)
+        self.assertIsNone(info.offending)
+        self.assertEqual(info.segments_7bit, 1)
+        self.assertEqual(info.segments_8bit, 2)
+        self.assertEqual(info.segments_ucs2, 3)
+
+        info = classify("x" * 150 + "€" * 6)
+        self.assertEqual(info.septets, 162)
+        self.assertEqual(info.segments_7bit, 2)
+
+        info = classify("abc`dş")
+        self.assertFalse(info.is_gsm)
+        self.assertIsNone(info.septets)
+        self.assertIsNone(info.segments_7bit)
+        self.assertEqual(info.offending, "`")
+        self.assertEqual(info.offending_index, 3)
+        self.assertEqual(info.segments_ucs2, 1)
+
+        info = classify("abcdş", get_charset(TURKISH, TURKISH))
+        self.assertTrue(info.is_gsm)
+
+    def test_estimate(self):
+        est = estimate("hello")
+        self.assertEqual(est.fmt, 0x00)
+        self.assertEqual(est.segments, 1)
+        self.assertEqual(est.ranges, [(0, 5)])
+        self.assertEqual(est.remaining, 155)
+
+        est = estimate("x" * 161)
+        self.assertEqual(est.segments, 2)
+        self.assertEqual(est.ranges, [(0, 153), (153, 161)])
+        self.assertEqual(est.remaining, 145)
+
+        # the escape sequence of the 77th character is not split
+        est = estimate("€" * 229 + "x")
+        self.assertEqual(est.ranges,
+                         [(0, 76), (76, 152), (152, 228), (228, 230)])
+        self.assertEqual(est.remaining, 150)
+
+        est = estimate("ő" * 71)
+        self.assertEqual(est.fmt, 0x08)
+        self.assertEqual(est.ranges, [(0, 67), (67, 71)])
+        self.assertEqual(est.remaining, 63)
+
+        est = estimate("x" * 160, udh_extra=6)
+        self.assertEqual(est.segments, 2)
+        self.assertEqual(est.ranges, [(0, 146), (146, 160)])
+
+    def test_estimate_16bit_concat(self):
+        est = estimate("x" * 305, concat_bits=16)
+        self.assertEqual(est.ranges, [(0, 152), (152, 304), (304, 305)])
+        self.assertEqual(estimate("ő" * 133, concat_bits=16).segments, 3)
+
+    def test_estimate_matches_submit(self):
+        for text in ("x" * 459, "€" * 270 + "x", "ő" * 135, "hi"):
+            pdus = SmsSubmit("+3530000000", text).to_pdu()
+            self.assertEqual(estimate(text).segments, len(pdus))
@@ -0,0 +1,73 @@
+from multiprocessing import Pool
+import os
+import tempfile
+from unittest import TestCase
+
+from messaging.sms import SmsSubmit
+from messaging.sms.refs import FileRefAllocator, RefAllocator
+
+
+def _allocate(path):
+    allocator = FileRefAllocator(path, bits=16)
+    try:
+        return [allocator.allocate("+3530000000") for _ in range(50)]
+    finally:
+        allocator.close()
+
+
+class TestRefAllocator(TestCase):
+
+    def test_per_destination(self):
+        allocator = RefAllocator()
+        self.assertEqual([allocator.allocate("+3530000000") for _ in range(3)],
+                         [0, 1, 2])
+        self.assertEqual(allocator.allocate("+3530000001"), 0)
+        self.assertEqual(allocator.allocate("+3530000000"), 3)
+
+    def test_bounded(self):
+        allocator = RefAllocator(slots=16)
+        for i in range(1000):
+            allocator.allocate("+353%07d" % i)
+
+        self.assertEqual(len(allocator._counters), 16)
+        ref = allocator.allocate("+3530000000")
+        self.assertEqual(allocator.allocate("+3530000000"), (ref + 1) & 0xFF)
+
+    def test_wrap_around(self):
+        allocator = RefAllocator(start=254)
+        self.assertEqual([allocator.allocate() for _ in range(3)],
+                         [254, 255, 0])
+
+        allocator = RefAllocator(bits=16, start=0xFFFF)
+        self.assertEqual([allocator.allocate() for _ in range(2)],
+                         [0xFFFF, 0])
+
+        self.assertRaises(ValueError, RefAllocator, bits=12)
+
+    def test_submit_uses_allocators(self):
+        ref_allocator = RefAllocator()
+        concat_allocator = RefAllocator(start=10)
+        refs = []
+        for _ in range(2):
+            sms = SmsSubmit("+3530000000", "x" * 200)
+            sms.ref_allocator = ref_allocator
+            sms.concat_allocator = concat_allocator
+            pdu = bytes.fromhex(sms.to_pdu()[0].pdu)
+            # TP-MR and the reference of the concatenation IE
+            refs.append((pdu[2], pdu[16]))
+
+        self.assertEqual(refs, [(0, 10), (1, 11)])
+
+    def test_file_allocator(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        with Pool(4) as pool:
+            refs = sum(pool.map(_allocate, [path] * 4), [])
+        self.assertEqual(sorted(refs), list(range(200)))
+
+        allocator = FileRefAllocator(path)
+        self.addCleanup(allocator.close)
+        self.assertEqual(allocator.allocate("+3530000000"), 200)
+        self.assertEqual(allocator.allocate("+3530000001"), 0)
@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+from messaging.sms import SmsSubmit
+from messaging.sms.planner import plan_encoding
+from messaging.sms.segmentation import (is_grapheme_boundary, split_septets,
+                                        split_text, utf16_len)
+
+GRINNING = '\U0001F600'
+FLAG_IE = '\U0001F1EE\U0001F1EA'
+FAMILY = '\U0001F468\u200d\U0001F469\u200d\U0001F467'
+THUMBS_UP = '\U0001F44D\U0001F3FD'
+
+
+class TestSegmentation(TestCase):
+
+    def test_escape_sequences(self):
+        data = b'\x1be' * 5
+        self.assertEqual(split_septets(data, 9, 5),
+                         [(0, 4), (4, 8), (8, 10)])
+        self.assertEqual(split_septets(data, 9, 3),
+                         [(0, 2), (2, 4), (4, 6), (6, 8), (8, 10)])
+
+    def test_septet_word_boundaries(self):
+        data = b'aaa bbb ccc'
+        self.assertEqual(split_septets(data, 8, 6, 3),
+                         [(0, 4), (4, 8), (8, 11)])
+        # too far away
+        self.assertEqual(split_septets(data, 8, 6, 1),
+                         [(0, 6), (6, 11)])
+        # a form feed is an escape sequence, not a line break
+        data = b'aaa\x1b\x0abbb'
+        self.assertEqual(split_septets(data, 6, 6, 3), [(0, 6), (6, 8)])
+
+    def test_surrogate_pairs(self):
+        text = GRINNING * 36
+        self.assertEqual(utf16_len(text), 72)
+        self.assertEqual(split_text(text, 70, 67), [(0, 33), (33, 36)])
+        self.assertEqual(split_text(GRINNING * 35, 70, 67), [(0, 35)])
+
+    def test_grapheme_clusters(self):
+        self.assertFalse(is_grapheme_boundary(FAMILY, 1))
+        self.assertFalse(is_grapheme_boundary(FAMILY, 2))
+        self.assertFalse(is_grapheme_boundary(THUMBS_UP, 1))
+        self.assertFalse(is_grapheme_boundary('e\u0301', 1))
+        self.assertFalse(is_grapheme_boundary(FLAG_IE * 2, 1))
+        self.assertTrue(is_grapheme_boundary(FLAG_IE * 2, 2))
+        self.assertFalse(is_grapheme_boundary('\r\n', 1))
+
+        text = 'x' * 65 + FLAG_IE + 'x'
+        self.assertEqual(split_text(text, 67, 66), [(0, 65), (65, 68)])
+
+        text = 'x' * 60 + FAMILY + 'x' * 10
+        self.assertEqual(split_text(text, 67, 64), [(0, 60), (60, 75)])
+
+    def test_text_word_boundaries(self):
+        text = 'hello world ' * 10
+        segments = split_text(text, 67, 67, 10)
+        self.assertEqual(segments, [(0, 66), (66, 120)])
+
+    def test_submit(self):
+        text = (GRINNING + ' ') * 30
+        sms = SmsSubmit("+3530000000", text)
+        pdus = sms.to_pdu()
+        self.assertEqual(sms.fmt, 0x08)
+        self.assertEqual(len(pdus), 2)
+        # no lone surrogates
+        for start, end in sms.plan.segments:
+            text[start:end].encode('utf-16-be')
+
+        plan = plan_encoding('word ' * 40, word_tolerance=10)
+        self.assertEqual(plan.segments, [(0, 150), (150, 200)])
@@ -1,12 +1,19 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import binascii
 from unittest import TestCase
 
-from messaging.sms import SmsSubmit, SmsDeliver
+import messaging
+from messaging.sms import SmsSubmit, SmsDeliver, SubmitProfile, encode_many
+from messaging.sms.batch import decode_batch
+from messaging.sms.submit import _encode_address, _encode_smsc
+from messaging.sms.udh import UserDataHeader
 from messaging.utils import (timedelta_to_relative_validity as to_relative,
                              datetime_to_absolute_validity as to_absolute,
-                             FixedOffset)
+                             decode_scts, FixedOffset, pack_8bits_to_7bits,
+                             pack_8bits_to_ucs2, pack_ud_7bit, pack_ud_ucs2,
+                             udh_septets)
+from tests.utils import get_pdus
 
 
 class TestEncodingFunctions(TestCase):
@@ -48,6 +55,41 @@ class TestEncodingFunctions(TestCase):
         expected = [0x99, 0x20, 0x21, 0x50, 0x75, 0x03, 0x29]
         self.assertEqual(to_absolute(when, "GMT-3"), expected)
 
+    def test_decoding_scts(self):
+        # 12. Feb 1999 05:57:30 GMT+3
+        when = decode_scts([0x99, 0x20, 0x21, 0x50, 0x75, 0x03, 0x21])
+        self.assertEqual(when, datetime(1999, 2, 12, 5, 57, 30, 0,
+                                        FixedOffset(3 * 60, "GMT+3")))
+        self.assertEqual(when.utcoffset(), timedelta(hours=3))
+
+        when = decode_scts([0x01, 0x20, 0x21, 0x50, 0x75, 0x03, 0x29])
+        self.assertEqual(when.year, 2010)
+        self.assertEqual(when.utcoffset(), timedelta(hours=-3))
+
+        self.assertRaises(ValueError, decode_scts,
+                          [0x99, 0x31, 0x21, 0x50, 0x75, 0x03, 0x21])
+
+    def test_packing_user_data(self):
+        self.assertEqual(pack_ud_7bit(b'hellohello'),
+                         bytes.fromhex('0AE8329BFD4697D9EC37'))
+        self.assertEqual(pack_8bits_to_7bits('hellohello'),
+                         '0ae8329bfd4697d9ec37')
+
+        # a 6 octet UDH takes 7 septets, 1 fill bit included
+        udh = bytes.fromhex('050003880301')
+        ud = pack_ud_7bit(b'hellohello', udh)
+        self.assertEqual(ud[0], 17)
+        self.assertEqual(ud[1:7], udh)
+        self.assertEqual(ud.hex(), pack_8bits_to_7bits('\x00hellohello', udh))
+        self.assertEqual(udh_septets(6), (7, 1))
+        self.assertEqual(udh_septets(7), (8, 0))
+
+        self.assertEqual(pack_ud_ucs2('h\u0151'), b'\x04\x00h\x01\x51')
+        self.assertEqual(pack_8bits_to_ucs2('h\u0151', udh),
+                         '0a05000388030100680151')
+        # outside the BMP, a surrogate pair
+        self.assertEqual(pack_ud_ucs2('\U0001F600'), b'\x04\xd8\x3d\xde\x00')
+
 
 class TestSmsSubmit(TestCase):
 
@@ -231,14 +273,18 @@ class TestSmsSubmit(TestCase):
             self.assertEqual(pdu.cnt, cnt)
 
     def test_encoding_multipart_7bit_egsm(self):
-        # text encoded with umts-tools
+        # umts-tools splits the escape sequence of the 77th character
+        # between the first two segments, they hold 76 characters instead
         self.maxDiff = None
         text = '€' * 229 + 'x'
         number = binascii.unhexlify(b'363535333435363738').decode()
+        head = "005100098156355476F80000AA"
+        euros = "36" + "E54D7953DE9437" * 18 + "E54D7953DE9401"
         expected = [
-            "005100098156355476F80000AAA005000388030136E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437",
-            "005100098156355476F80000AAA0050003880302CA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA9BF2A6BC296FCA",
-            "005100098156355476F80000AAA005000388030336E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE9437E54D7953DE94F1",
+            head + "9F050003880401" + euros,
+            head + "9F050003880402" + euros,
+            head + "9F050003880403" + euros,
+            head + "0A05000388040436653C",
         ]
 
         sms = SmsSubmit(number, text)
@@ -253,6 +299,188 @@ class TestSmsSubmit(TestCase):
             self.assertEqual(pdu.seq, i + 1)
             self.assertEqual(pdu.cnt, cnt)
 
+    def test_encoding_national_language_shift(self):
+        text = "Çağrı İşlem ş"
+        # UDH with the Turkish single and locking shift IEs
+        expected = "0041000A915303000000000015062401012501018930437E00013BEC721BD401"
+
+        sms = SmsSubmit("+3530000000", text)
+        sms.ref = 0x0
+        sms.locking_shift = 1
+        sms.single_shift = 1
+
+        pdu = sms.to_pdu()[0]
+        self.assertEqual(pdu.pdu, expected)
+        self.assertEqual(sms.fmt, 0x00)
+
+        # not representable, falls back to UCS2
+        sms = SmsSubmit("+3530000000", "Çağrı 中")
+        sms.single_shift = 1
+        sms.to_pdu()
+        self.assertEqual(sms.fmt, 0x08)
+
+    def test_encoding_binary(self):
+        sms = SmsSubmit("+3530000000", "x" * 200)
+        sms.ref = 0x0
+        sms.rand_id = 136
+        sms.csca = "+34646456456"
+        pdus = sms.to_pdu()
+        raw = sms.to_pdu(binary=True)
+
+        self.assertEqual(len(raw), 2)
+        for pdu, data in zip(pdus, raw):
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(data.hex().upper(), pdu.pdu)
+            self.assertEqual(len(data) - data[0] - 1, pdu.length)
+
+        sms.rand_id = 136
+        tpdus = sms.to_tpdus()
+        self.assertEqual([tpdu.hex().upper() for tpdu in tpdus],
+                         [pdu.pdu[16:] for pdu in pdus])
+        # SMS-SUBMIT with UDHI first
+        self.assertEqual([tpdu[0] for tpdu in tpdus], [0x41, 0x41])
+        self.assertEqual([len(tpdu) for tpdu in tpdus],
+                         [pdu.length for pdu in pdus])
+
+    def test_encoding_smpp(self):
+        sms = SmsSubmit("+3530000000", "hello")
+        segment, = sms.to_smpp()
+        self.assertEqual(segment.data_coding, 0x00)
+        self.assertEqual(segment.esm_class, 0x00)
+        self.assertEqual(segment.short_message, b"hello")
+
+        segment, = sms.to_smpp(packed=True)
+        self.assertEqual(segment.short_message, bytes.fromhex('E8329BFD06'))
+
+        sms = SmsSubmit("+3530000000", "x" * 200)
+        sms.rand_id = 136
+        segments = sms.to_smpp()
+        self.assertEqual(len(segments), 2)
+        self.assertEqual(segments[0].esm_class, 0x40)
+        self.assertEqual(segments[1].short_message,
+                         bytes.fromhex('050003880202') + b"x" * 47)
+
+        # the packed UD is the TP-UD of the PDU
+        pdu = sms.to_pdu(binary=True)[1]
+        short_message = sms.to_smpp(packed=True)[1].short_message
+        self.assertTrue(pdu.endswith(short_message))
+
+        sms = SmsSubmit("+3530000000", "h\u0151")
+        segment, = sms.to_smpp()
+        self.assertEqual(segment.data_coding, 0x08)
+        self.assertEqual(segment.short_message, b"\x00h\x01\x51")
+
+    def test_encoding_many(self):
+        numbers = ["+3530000000", "+34616585119", "600000000"]
+        sms = SmsSubmit(numbers[0], "x" * 200)
+        sms.ref = 0xFE
+        sms.rand_id = 136
+        sms.validity = timedelta(days=4)
+        ret = sms.to_pdu_many(numbers)
+        self.assertEqual(len(ret), 3)
+
+        for i, (number, pdus) in enumerate(zip(numbers, ret)):
+            single = SmsSubmit(number, "x" * 200)
+            single.ref = (0xFE + i) & 0xFF
+            single.rand_id = 136
+            single.validity = timedelta(days=4)
+            expected = single.to_pdu()
+            self.assertEqual([pdu.pdu for pdu in pdus],
+                             [pdu.pdu for pdu in expected])
+            self.assertEqual([pdu.seq for pdu in pdus], [1, 2])
+            self.assertEqual(pdus[0].length, expected[0].length)
+
+        raw = sms.to_pdu_many(numbers[:1], binary=True)
+        self.assertEqual([pdu.hex().upper() for pdu in raw[0]],
+                         [pdu.pdu for pdu in ret[0]])
+
+        self.assertRaises(ValueError, sms.to_pdu_many, ["032BADNUMBER"])
+
+    def test_encoding_many_concat_reference(self):
+        # to_pdu and to_pdu_many never give a number the same reference
+        def get_concat(pdu):
+            # TP-UDL at 13, then the UDH
+            return UserDataHeader.from_bytes(pdu[15:15 + pdu[14]]).concat
+
+        numbers = ["+34600000001", "+34600000002"]
+        refs = {number: set() for number in numbers}
+        for concat_bits in (8, 16):
+            sms = SmsSubmit(numbers[0], "x" * 400)
+            sms.concat_bits = concat_bits
+            for _ in range(3):
+                sms.rand_id = None
+                pdus = sms.to_pdu(binary=True)
+                refs[numbers[0]].add((concat_bits, get_concat(pdus[0]).ref))
+
+                for number, pdus in zip(numbers, sms.to_pdu_many(numbers)):
+                    concats = [get_concat(bytes.fromhex(pdu.pdu))
+                               for pdu in pdus]
+                    self.assertEqual([concat.seq for concat in concats],
+                                     [1, 2, 3])
+                    self.assertEqual(len({concat.ref for concat in concats}),
+                                     1)
+                    refs[number].add((concat_bits, concats[0].ref))
+
+        self.assertEqual(len(refs[numbers[0]]), 12)
+        self.assertEqual(len(refs[numbers[1]]), 6)
+
+    def test_encoding_16bit_concat(self):
+        sms = SmsSubmit("+3530000000", "x" * 305)
+        sms.concat_bits = 16
+        sms.rand_id = 0x1234
+        pdus = sms.to_pdu(binary=True)
+        self.assertEqual(len(pdus), 3)
+
+        for i, pdu in enumerate(pdus):
+            # TP-UDL then the UDH, holding the 16 bit concatenation IE
+            udh = UserDataHeader.from_bytes(pdu[14:20])
+            self.assertEqual(udh.concat.ref, 0x1234)
+            self.assertEqual(udh.concat.cnt, 3)
+            self.assertEqual(udh.concat.seq, i + 1)
+
+        # 8 UDH septets and 152 characters
+        self.assertEqual([pdu[12] for pdu in pdus], [160, 160, 9])
+
+    def test_address_encoding(self):
+        self.assertEqual(_encode_address("+3530000000"),
+                         bytes.fromhex("0A915303000000"))
+        self.assertEqual(_encode_address(" 653 456789"),
+                         bytes.fromhex("098156436587F9"))
+        self.assertEqual(_encode_smsc("+34646456456"),
+                         bytes.fromhex("07914346466554F6"))
+        self.assertEqual(_encode_smsc(None), b"\x00")
+
+        # cached, the SMSC address is the same for every message
+        hits = _encode_smsc.cache_info().hits
+        for _ in range(3):
+            sms = SmsSubmit("+3530000000", "hi")
+            sms.csca = "+34646456456"
+            sms.to_pdu()
+        self.assertGreaterEqual(_encode_smsc.cache_info().hits, hits + 2)
+
+    def test_encoding_traced(self):
+        events = []
+        messaging.set_tracer(lambda stage, **fields:
+                             events.append((stage, fields)))
+        self.addCleanup(messaging.set_tracer, None)
+
+        sms = SmsSubmit("+3530000000", "x" * 200)
+        sms.csca = "+34646456456"
+        pdus = sms.to_pdu()
+
+        self.assertEqual([stage for stage, _ in events],
+                         ['sms.submit.segment', 'sms.submit.segment',
+                          'sms.submit'])
+        self.assertEqual([fields['size'] for _, fields in events[:2]],
+                         [pdu.length for pdu in pdus])
+        self.assertEqual(events[1][1]['seq'], 2)
+        self.assertEqual(events[2][1]['segments'], 2)
+        self.assertEqual(events[2][1]['length'], 200)
+
+        messaging.set_tracer(None)
+        sms.to_pdu()
+        self.assertEqual(len(events), 3)
+
     def test_encoding_bad_number_raises_error(self):
         self.assertRaises(ValueError, SmsSubmit, "032BADNUMBER", "text")
 
@@ -261,6 +489,53 @@ class TestSmsSubmit(TestCase):
         self.assertRaises(ValueError, setattr, sms, 'csca', "1badcsca")
 
 
+class TestSubmitProfile(TestCase):
+
+    def get_pdus(self, text, profile=None, **options):
+        return get_pdus(text, ref=0, rand_id=136, profile=profile, **options)
+
+    def test_same_pdus(self):
+        validity = datetime(2024, 1, 1, 10, 0, tzinfo=FixedOffset(60, "CET"))
+        cases = [
+            {},
+            {'csca': "+34646456456", 'klass': 1, 'pid': 0x41},
+            {'validity': timedelta(days=2), 'request_status': True},
+            {'validity': validity, 'klass': 0},
+        ]
+        for options in cases:
+            profile = SubmitProfile(**options)
+            for text in ("hello", "x" * 200, "ő" * 10):
+                self.assertEqual(self.get_pdus(text, profile),
+                                 self.get_pdus(text, **options))
+
+        # the profile takes precedence
+        profile = SubmitProfile(klass=2)
+        self.assertEqual(self.get_pdus("hello", profile, klass=1),
+                         self.get_pdus("hello", klass=2))
+
+    def test_validity(self):
+        validity = datetime(2024, 1, 1, 10, 0, tzinfo=FixedOffset(60, "CET"))
+        profile = SubmitProfile(validity=validity)
+        msgvp_pdu = profile.msgvp_pdu
+        profile.validity = datetime(2024, 1, 1, 10, 0,
+                                    tzinfo=FixedOffset(60, "CET"))
+        self.assertIs(profile.msgvp_pdu, msgvp_pdu)
+
+        # the same instant, another time zone
+        profile.validity = datetime(2024, 1, 1, 9, 0, tzinfo=timezone.utc)
+        self.assertNotEqual(profile.msgvp_pdu, msgvp_pdu)
+        self.assertEqual(profile.sms_submit_pdu[True], b"\x59")
+
+        profile.validity = None
+        self.assertEqual(profile.msgvp_pdu, b"")
+        self.assertEqual(profile.sms_submit_pdu[False], b"\x01")
+
+    def test_bad_values(self):
+        self.assertRaises(ValueError, SubmitProfile, csca="1badcsca")
+        self.assertRaises(ValueError, SubmitProfile, klass=4)
+        self.assertRaises(TypeError, SubmitProfile, validity=5)
+
+
 class TestSubmitPduCounts(TestCase):
 
     DEST = "+3530000000"
@@ -304,13 +579,14 @@ class TestSubmitPduCounts(TestCase):
         self.assertEqual(len(sms.to_pdu()), 1)
 
     def test_egsm_3(self):
-        sms = SmsSubmit(self.DEST, self.EGSM_CHAR * 153)  # 306 septets
-        self.assertEqual(len(sms.to_pdu()), 2)
+        # 306 septets, escape sequences are not split so 152 per segment
+        sms = SmsSubmit(self.DEST, self.EGSM_CHAR * 153)
+        self.assertEqual(len(sms.to_pdu()), 3)
 
     def test_egsm_4(self):
         sms = SmsSubmit(self.DEST,
                           self.EGSM_CHAR * 229 + self.GSM_CHAR)  # 459 septets
-        self.assertEqual(len(sms.to_pdu()), 3)
+        self.assertEqual(len(sms.to_pdu()), 4)
 
     def test_egsm_5(self):
         sms = SmsSubmit(self.DEST,
@@ -342,6 +618,48 @@ class TestSubmitPduCounts(TestCase):
         self.assertEqual(len(sms.to_pdu()), 4)
 
 
+class TestEncodeMany(TestCase):
+
+    def get_requests(self):
+        for i in range(50):
+            options = {'ref': i, 'rand_id': i}
+            if i % 2:
+                options['validity'] = timedelta(days=i)
+            yield "+353%07d" % i, "message %d " % i * (i % 20 + 1), options
+
+    def get_expected(self):
+        return [get_pdus(text, number, **options)
+                for number, text, options in self.get_requests()]
+
+    def test_in_process(self):
+        ret = [[pdu.pdu for pdu in pdus]
+               for pdus in encode_many(self.get_requests(), workers=1)]
+        self.assertEqual(ret, self.get_expected())
+
+    def test_pool(self):
+        ret = encode_many(self.get_requests(), workers=2, chunksize=7,
+                          binary=True)
+        ret = [[pdu.hex().upper() for pdu in pdus] for pdus in ret]
+        self.assertEqual(ret, self.get_expected())
+
+    def test_pool_references(self):
+        # the references are not allocated by every worker on its own
+        requests = [("+3530000000", "x" * 200, None)] * 100
+        ret = encode_many(requests, workers=2, chunksize=50, binary=True)
+        refs = set()
+        for pdus in ret:
+            # TP-UDL at 12, then the UDH
+            udh = UserDataHeader.from_bytes(pdus[0][14:14 + pdus[0][13]])
+            refs.add((pdus[0][2], udh.concat.ref))
+
+        self.assertEqual(len({mr for mr, _ in refs}), 100)
+        self.assertEqual(len({ref for _, ref in refs}), 100)
+
+    def test_unknown_option(self):
+        requests = [("+3530000000", "hi", {'colour': 'red'})]
+        self.assertRaises(TypeError, list, encode_many(requests, workers=1))
+
+
 class TestSmsDeliver(TestCase):
 
     def test_decoding_7bit_pdu(self):
@@ -398,6 +716,12 @@ class TestSmsDeliver(TestCase):
         sms = SmsDeliver(pdu)
         self.assertEqual(sms.date, date)
 
+        # the original offset is kept in the timezone-aware scts
+        scts = datetime(2010, 9, 11, 15, 10, 11, 0,
+                        timezone(timedelta(hours=-3)))
+        self.assertEqual(sms.scts, scts)
+        self.assertEqual(sms.scts.utcoffset(), timedelta(hours=-3))
+
     def test_decoding_number_alphanumeric(self):
         # Odd length test
         pdu = "07919471060040340409D0C6A733390400009060920173018093CC74595C96838C4F6772085AD6DDE4320B444E9741D4B03C6D7EC3E9E9B71B9474D3CB727799DEA286CFE5B9991DA6CBC3F432E85E9793CBA0F09A9EB6A7CB72BA0B9474D3CB727799DE72D6E9FABAFB0CBAA7E56490BA4CD7D34170F91BE4ACD3F575F7794E0F9F4161F1B92C2F8FD1EE32DD054AA2E520E3D3991C82A8E5701B"
@@ -451,6 +775,14 @@ class TestSmsDeliver(TestCase):
             self.assertEqual(sms.udh.concat.seq, i + 1)
             self.assertEqual(sms.udh.concat.ref, 25)
 
+    def test_decoding_national_language_shift(self):
+        pdu = "00440A91530300000000009090619000004015062401012501018930437E00013BEC721BD401"
+
+        sms = SmsDeliver(pdu)
+        self.assertEqual(sms.udh.locking_shift, 1)
+        self.assertEqual(sms.udh.single_shift, 1)
+        self.assertEqual(sms.text, "Çağrı İşlem ş")
+
     def test_decoding_odd_length_pdu_strict_raises_valueerror(self):
         # same pdu as in test_decoding_number_alpha1 minus last char
         pdu = "07919471060040340409D0C6A733390400009060920173018093CC74595C96838C4F6772085AD6DDE4320B444E9741D4B03C6D7EC3E9E9B71B9474D3CB727799DEA286CFE5B9991DA6CBC3F432E85E9793CBA0F09A9EB6A7CB72BA0B9474D3CB727799DE72D6E9FABAFB0CBAA7E56490BA4CD7D34170F91BE4ACD3F575F7794E0F9F4161F1B92C2F8FD1EE32DD054AA2E520E3D3991C82A8E5701"
@@ -504,3 +836,34 @@ class TestSmsDeliver(TestCase):
 #        sms = SmsDeliver(pdu)
 #        self.assertEqual(sms.csca, csca)
 #        self.assertEqual(sms.number, number)
+
+
+class TestDeliverBatch(TestCase):
+
+    def test_decode_batch(self):
+        pdus = [
+            "07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07",
+            "07914306073011F0040B914316709807F2000880604290224080084E2D5174901A8BAF",
+            "07919471227210244405852122F039F1015062712181804F050003190202E4E8309B5E7683DAFC319A5E76B340F73D9A5D7683A6E93268FD9ED3CB6EF67B0E5AD172B19B2C2693C9602E90355D6683A6F0B007946E8382F5393BEC26BB00",
+            "0791538375000075061805810531F1019082416500400190824165004000",
+        ]
+        batch = decode_batch(pdus)
+
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(batch.errors, [3])
+        for i, pdu in enumerate(pdus[:3]):
+            sms = SmsDeliver(pdu)
+            self.assertEqual(batch.text(i), sms.text)
+            self.assertEqual(batch.sender(i), sms.number)
+            self.assertEqual(batch.fmt[i], sms.fmt)
+            self.assertEqual(batch.date[i],
+                             int(sms.date.replace(tzinfo=timezone.utc).timestamp()))
+
+        self.assertEqual(batch.ref[0], -1)
+        self.assertEqual(batch.row(2)['ref'], 25)
+        self.assertEqual(batch.row(2)['seq'], 2)
+        self.assertEqual(batch.fmt[3], 0xFF)
+
+    def test_decode_batch_strict(self):
+        self.assertRaises(ValueError, decode_batch, ["0001000B9143"],
+                          strict=True)
@@ -0,0 +1,56 @@
+from datetime import timedelta
+from unittest import TestCase
+
+from messaging.sms.template import SmsTemplate
+from tests.utils import NUMBER, get_submit
+
+
+class TestSmsTemplate(TestCase):
+
+    def assertRenders(self, template, options=None, **values):
+        options = dict(options or {}, ref=0x12, rand_id=136)
+        tpl = SmsTemplate(template, **options)
+        expected = get_submit(template.format(**values), **options).to_pdu()
+        pdus = tpl.render(NUMBER, **values)
+        self.assertEqual([pdu.pdu for pdu in pdus],
+                         [pdu.pdu for pdu in expected])
+        self.assertEqual([pdu.length for pdu in pdus],
+                         [pdu.length for pdu in expected])
+        return tpl
+
+    def test_7bit(self):
+        # every alignment of the fields
+        for i in range(9):
+            tpl = self.assertRenders("x" * i + "Your code is {code}",
+                                     code="123456")
+            self.assertEqual(tpl.fmt, 0x00)
+
+        self.assertRenders("{code} is your code", code="1234")
+        self.assertRenders("Hi {name}, {amount:>8.2f}{currency}!",
+                           name="Ana", amount=12.5, currency="€")
+        self.assertRenders("Code: {code}", code="")
+        self.assertRenders("No fields")
+
+    def test_options(self):
+        self.assertRenders("Your code is {code}",
+                           {'csca': "+34646456456",
+                            'validity': timedelta(hours=1), 'klass': 1},
+                           code="1234")
+
+    def test_ucs2(self):
+        tpl = self.assertRenders("Ваш код {code}", code="1234")
+        self.assertEqual(tpl.fmt, 0x08)
+        self.assertRenders("Ваш код {code}", code="\U0001F600")
+
+    def test_fallback(self):
+        # not in the GSM alphabet
+        self.assertRenders("Your code is {code}", code="ő")
+        # more than one segment
+        self.assertRenders("Your code is {code}", code="x" * 150)
+        self.assertRenders("Ваш код {code}", code="x" * 70)
+
+    def test_binary(self):
+        tpl = SmsTemplate("Your code is {code}", ref=0)
+        pdu, = tpl.render(NUMBER, binary=True, code="1234")
+        self.assertEqual(pdu.hex().upper(),
+                         tpl.render(NUMBER, code="1234")[0].pdu)
@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from messaging.sms import SmsSubmit
+from messaging.sms.gsm0338 import is_valid_gsm
+from messaging.sms.translit import (CYRILLIC_TABLE, DEFAULT_TABLE,
+                                    TranslitTable)
+
+
+class TestTransliteration(TestCase):
+
+    def test_default_table(self):
+        text = '“Café” – naïve… Łódź ç'
+        translated, count = DEFAULT_TABLE.transliterate(text)
+        self.assertEqual(translated, '"Café" - naive... Lodz Ç')
+        self.assertEqual(count, 9)
+        self.assertTrue(is_valid_gsm(translated))
+
+        # GSM characters are left alone
+        self.assertEqual(DEFAULT_TABLE.substitutions('éèüß@$'), 0)
+
+    def test_cyrillic_table(self):
+        text = 'Привет, щи!'
+        self.assertEqual(CYRILLIC_TABLE.transliterate(text),
+                         ('Privet, shchi!', 8))
+        self.assertEqual(DEFAULT_TABLE.substitutions(text), 0)
+
+    def test_custom_table(self):
+        table = TranslitTable({'’': "'"}, {'’': '`'})
+        self.assertEqual('it’s'.translate(table), 'it`s')
+
+    def test_submit(self):
+        text = 'Don’t miss our “special” offer – ' * 3
+        sms = SmsSubmit("+3530000000", text)
+        self.assertEqual(len(sms.to_pdu()), 2)
+        self.assertEqual(sms.fmt, 0x08)
+        self.assertEqual(sms.substitutions, 0)
+
+        sms = SmsSubmit("+3530000000", text)
+        sms.translit = DEFAULT_TABLE
+        self.assertEqual(len(sms.to_pdu()), 1)
+        self.assertEqual(sms.fmt, 0x00)
+        self.assertEqual(sms.substitutions, 12)
+        self.assertEqual(sms.plan.text, text.translate(DEFAULT_TABLE))
+
+        # a single segment in UCS2 too
+        text = "Hello “world” – it’s ok…"
+        sms = SmsSubmit("+3530000000", text)
+        sms.translit = DEFAULT_TABLE
+        self.assertEqual(len(sms.to_pdu()), 1)
+        self.assertEqual(sms.fmt, 0x00)
+        self.assertEqual(sms.plan.text, text.translate(DEFAULT_TABLE))
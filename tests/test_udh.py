@@ -1,6 +1,7 @@
 from unittest import TestCase
 
-from messaging.sms.udh import UserDataHeader
+from messaging.sms.udh import (ConcatReference, PortAddress,
+                               UserDataHeader)
 from messaging.utils import hex_to_int_array
 
 
@@ -22,3 +23,37 @@ class TestUserDataHeader(TestCase):
         self.assertEqual(udh.concat.seq, 1)
         self.assertEqual(udh.concat.cnt, 2)
         self.assertEqual(udh.concat.ref, 25)
+
+    def test_user_data_header_port_width(self):
+        udh = UserDataHeader.from_bytes(hex_to_int_array("05040b8423f0"))
+        self.assertFalse(udh.ports.eight_bits)
+
+        udh = UserDataHeader.from_bytes(hex_to_int_array("0402f5f5"))
+        self.assertTrue(udh.ports.eight_bits)
+        self.assertEqual(udh.ports.dest_port, 0xf5)
+
+    def test_user_data_header_all_ies(self):
+        # special SMS indication, single shift, locking shift, EMS
+        data = bytes.fromhex("01028103240101250101" "0a03000a01")
+        udh = UserDataHeader.from_bytes(data)
+
+        self.assertEqual(udh.special[0].msg_type, 1)
+        self.assertEqual(udh.special[0].count, 3)
+        self.assertTrue(udh.special[0].store)
+        self.assertEqual(udh.single_shift, 1)
+        self.assertEqual(udh.locking_shift, 1)
+        self.assertEqual(udh.ems, [(0x0a, b'\x00\x0a\x01')])
+        self.assertEqual(udh.to_bytes(), bytes([len(data)]) + data)
+
+    def test_user_data_header_builder(self):
+        udh = UserDataHeader(concat=ConcatReference(0x88, 3, 1, True))
+        self.assertEqual(udh.to_bytes(), bytes.fromhex("050003880301"))
+
+        udh = UserDataHeader(concat=ConcatReference(40846, 2, 1, False),
+                             ports=PortAddress(2948, 9200, False))
+        self.assertEqual(udh.to_bytes(),
+                         bytes.fromhex("0c08049f8e020105040b8423f0"))
+
+    def test_user_data_header_truncated(self):
+        self.assertRaises(ValueError, UserDataHeader.from_bytes,
+                          bytes.fromhex("000301"))
@@ -0,0 +1,16 @@
+from messaging.sms import SmsSubmit
+from messaging.sms.submit import _set_options
+
+NUMBER = "+3530000000"
+
+
+def get_submit(text, number=NUMBER, **options):
+    """Returns the SmsSubmit of ``text`` with the ``options`` attributes"""
+    sms = SmsSubmit(number, text)
+    _set_options(sms, options)
+    return sms
+
+
+def get_pdus(text, number=NUMBER, **options):
+    """Returns the hex PDUs of :func:`get_submit`"""
+    return [pdu.pdu for pdu in get_submit(text, number, **options).to_pdu()]